@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+"""Streaming aggregation of simulation results into NumPy arrays.
+
+Records are consumed one at a time and buffered in fixed-size chunks. Each full chunk is
+folded into a (prompt × NPC × verdict) count cube and exact value → count tables of the
+suspicion deltas, then dropped, so memory grows with the number of prompts, NPCs and
+distinct delta values rather than with the number of runs, and no dialogue is kept.
+"""
+
+from __future__ import annotations
+
+import math
+from collections.abc import Iterable, Iterator
+
+import numpy as np
+
+import stats
+
+VERDICTS = ("PASS", "FAIL", "ERROR")
+_VERDICT_CODES = {verdict: code for code, verdict in enumerate(VERDICTS)}
+_ERROR = _VERDICT_CODES["ERROR"]
+
+CHUNK_SIZE = 65536
+PERCENTILES = (5, 25, 50, 75, 95)
+HISTOGRAM_BINS = 12
+
+# Packs (group, delta) into one int64 so a chunk is grouped with a single np.unique
+_DELTA_OFFSET = 1 << 31
+
+
+def wilson_intervals(
+    successes: np.ndarray, trials: np.ndarray, confidence: float = 0.95,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Vectorised stats.wilson_interval: (0, 1) wherever there are no trials."""
+    z = stats.z_score(confidence)
+    trials = trials.astype(float)
+    safe = np.maximum(trials, 1.0)
+    p = successes / safe
+    denom = 1 + z * z / safe
+    centre = (p + z * z / (2 * safe)) / denom
+    margin = z * np.sqrt(p * (1 - p) / safe + z * z / (4 * safe * safe)) / denom
+    empty = trials <= 0
+    return (
+        np.where(empty, 0.0, np.maximum(0.0, centre - margin)),
+        np.where(empty, 1.0, np.minimum(1.0, centre + margin)),
+    )
+
+
+class DeltaDistribution:
+    """Exact distribution of integer suspicion deltas, kept as sorted value → count arrays."""
+
+    def __init__(self):
+        self.values = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def add(self, values: np.ndarray, counts: np.ndarray | None = None) -> None:
+        if counts is None:
+            values, counts = np.unique(values, return_counts=True)
+        if not len(values):
+            return
+        merged, inverse = np.unique(np.concatenate([self.values, values]), return_inverse=True)
+        weights = np.concatenate([self.counts, counts])
+        self.counts = np.bincount(inverse, weights=weights, minlength=len(merged)).astype(np.int64)
+        self.values = merged
+
+    @property
+    def n(self) -> int:
+        return int(self.counts.sum())
+
+    def percentiles(self, qs: Iterable[float] = PERCENTILES) -> dict[str, int]:
+        """Nearest-rank percentiles, e.g. {"p50": 0}."""
+        cumulative = np.cumsum(self.counts)
+        n = int(cumulative[-1]) if len(cumulative) else 0
+        if not n:
+            return {}
+        return {
+            f"p{q:g}": int(self.values[np.searchsorted(cumulative, max(1, math.ceil(q / 100 * n)))])
+            for q in qs
+        }
+
+    def histogram(self, max_bins: int = HISTOGRAM_BINS) -> list[dict]:
+        """Counts over equal-width integer bins spanning min..max, at most `max_bins` of them."""
+        if not self.n:
+            return []
+        low, high = int(self.values[0]), int(self.values[-1])
+        width = max(1, math.ceil((high - low + 1) / max_bins))
+        bins = np.bincount((self.values - low) // width, weights=self.counts).astype(np.int64)
+        return [
+            {"low": low + i * width, "high": low + (i + 1) * width - 1, "count": int(count)}
+            for i, count in enumerate(bins)
+        ]
+
+    def summary(self) -> dict:
+        n = self.n
+        if not n:
+            return {"n": 0}
+        return {
+            "n": n,
+            "mean": float(np.dot(self.values, self.counts) / n),
+            "min": int(self.values[0]),
+            "max": int(self.values[-1]),
+            **self.percentiles(),
+            "negative": int(self.counts[self.values < 0].sum()),
+            "zero": int(self.counts[self.values == 0].sum()),
+            "positive": int(self.counts[self.values > 0].sum()),
+            "histogram": self.histogram(),
+        }
+
+
+def _add_grouped(distributions: list[DeltaDistribution], groups: np.ndarray, deltas: np.ndarray) -> None:
+    """Fold a chunk of (group, delta) pairs into one distribution per group."""
+    if not len(deltas):
+        return
+    keys, counts = np.unique((groups << 32) + (deltas + _DELTA_OFFSET), return_counts=True)
+    key_groups = keys >> 32
+    key_values = (keys & 0xFFFFFFFF) - _DELTA_OFFSET
+    starts = np.flatnonzero(np.r_[True, key_groups[1:] != key_groups[:-1]])
+    for start, end in zip(starts, np.r_[starts[1:], len(keys)]):
+        distributions[int(key_groups[start])].add(key_values[start:end], counts[start:end])
+
+
+class ResultAggregator:
+    """Per-prompt and per-NPC verdict counts and suspicion-delta distributions, in one pass.
+
+    `add` takes result records as written by simulate.py (`prompt_index`, `npc`, `verdict`,
+    `suspicion_delta`); deltas of errored runs are ignored.
+    """
+
+    def __init__(self, prompts: list[str], npcs: list[str], chunk_size: int = CHUNK_SIZE):
+        self.prompts = list(prompts)
+        self.npcs = list(npcs)
+        self.chunk_size = chunk_size
+        self._npc_index = {slug: i for i, slug in enumerate(self.npcs)}
+        self.counts = np.zeros((len(self.prompts), len(self.npcs), len(VERDICTS)), dtype=np.int64)
+        self.deltas = DeltaDistribution()
+        self.prompt_deltas = [DeltaDistribution() for _ in self.prompts]
+        self.npc_deltas = [DeltaDistribution() for _ in self.npcs]
+        self._buffers: tuple[list[int], ...] = ([], [], [], [])
+
+    def add(self, record: dict) -> None:
+        prompt_buf, npc_buf, verdict_buf, delta_buf = self._buffers
+        prompt_buf.append(record["prompt_index"])
+        npc_buf.append(self._npc_index[record["npc"]])
+        verdict_buf.append(_VERDICT_CODES.get(record.get("verdict"), _ERROR))
+        delta = record.get("suspicion_delta", 0)
+        delta_buf.append(delta if isinstance(delta, int) else 0)
+        if len(prompt_buf) >= self.chunk_size:
+            self.flush()
+
+    def feed(self, records: Iterable[dict]) -> Iterator[dict]:
+        """Pass `records` through unchanged, aggregating each on the way."""
+        for record in records:
+            self.add(record)
+            yield record
+        self.flush()
+
+    def flush(self) -> None:
+        if not self._buffers[0]:
+            return
+        prompt, npc, verdict, delta = (np.array(buf, dtype=np.int64) for buf in self._buffers)
+        for buf in self._buffers:
+            buf.clear()
+        cell = (prompt * len(self.npcs) + npc) * len(VERDICTS) + verdict
+        self.counts += np.bincount(cell, minlength=self.counts.size).reshape(self.counts.shape)
+        scored = verdict != _ERROR
+        prompt, npc, delta = prompt[scored], npc[scored], delta[scored]
+        self.deltas.add(delta)
+        _add_grouped(self.prompt_deltas, prompt, delta)
+        _add_grouped(self.npc_deltas, npc, delta)
+
+    @property
+    def totals(self) -> dict[str, int]:
+        self.flush()
+        return {verdict: int(n) for verdict, n in zip(VERDICTS, self.counts.sum(axis=(0, 1)))}
+
+    def _rows(self, counts: np.ndarray, labels: list[str], deltas: list[DeltaDistribution],
+              confidence: float) -> list[dict]:
+        passes, fails, errors = counts[:, 0], counts[:, 1], counts[:, 2]
+        trials = passes + fails
+        low, high = wilson_intervals(passes, trials, confidence)
+        rates = np.divide(passes, trials, out=np.zeros(len(trials)), where=trials > 0)
+        return [
+            {
+                "label": label,
+                "pass": int(passes[i]),
+                "fail": int(fails[i]),
+                "error": int(errors[i]),
+                "pass_rate": float(rates[i] * 100),
+                "ci_low": float(low[i] * 100),
+                "ci_high": float(high[i] * 100),
+                "delta_median": deltas[i].percentiles((50,)).get("p50"),
+            }
+            for i, label in enumerate(labels)
+        ]
+
+    def by_prompt(self, confidence: float = 0.95) -> list[dict]:
+        self.flush()
+        return self._rows(self.counts.sum(axis=1), self.prompts, self.prompt_deltas, confidence)
+
+    def by_npc(self, confidence: float = 0.95) -> list[dict]:
+        self.flush()
+        return self._rows(self.counts.sum(axis=0), self.npcs, self.npc_deltas, confidence)
+
+    def summary(self, confidence: float = 0.95) -> dict:
+        """Everything above as plain JSON-serialisable data."""
+        return {
+            "confidence": confidence,
+            "totals": self.totals,
+            "by_prompt": self.by_prompt(confidence),
+            "by_npc": self.by_npc(confidence),
+            "suspicion_delta": self.deltas.summary(),
+        }
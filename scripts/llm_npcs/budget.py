@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+"""Token / request / wall-time budget for simulation runs, fed by the usage of real API calls.
+
+The governor subscribes to the metrics sink, so it counts the tokens and requests the API
+actually reported (cache hits are free). The scheduler asks it before starting each run:
+a run is admitted only if the budget still covers it on top of the runs already in flight,
+estimated from the mean usage of the runs finished so far (until one has finished, only
+the limits themselves are checked). As the budget nears exhaustion fewer runs are let in
+at once; once nothing is in flight and even one more run would not fit, scheduling stops.
+Runs already started always finish and are logged, so a stopped sweep reports on what it
+completed and can be resumed with a larger budget.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+
+import metrics
+
+
+@dataclass
+class Budget:
+    max_tokens: int | None = None
+    max_requests: int | None = None
+    max_wall_s: float | None = None
+    # USD per million prompt / completion tokens, to project cost (optional)
+    prompt_price: float | None = None
+    completion_price: float | None = None
+
+    @property
+    def limited(self) -> bool:
+        return any(v is not None for v in (self.max_tokens, self.max_requests, self.max_wall_s))
+
+    def cost(self, prompt_tokens: float, completion_tokens: float) -> float | None:
+        if self.prompt_price is None or self.completion_price is None:
+            return None
+        return (prompt_tokens * self.prompt_price + completion_tokens * self.completion_price) / 1_000_000
+
+
+def parse_price(value: str) -> tuple[float, float]:
+    """'2,6' → (2.0, 6.0): USD per million prompt and completion tokens; one number sets both."""
+    parts = [float(p) for p in value.split(",")]
+    if len(parts) == 1:
+        parts *= 2
+    if len(parts) != 2 or min(parts) < 0:
+        raise ValueError(f"expected PROMPT[,COMPLETION] prices, got {value!r}")
+    return parts[0], parts[1]
+
+
+class BudgetGovernor:
+    """Admits runs while the budget covers them; use as a context manager around the sweep."""
+
+    def __init__(self, budget: Budget):
+        self.budget = budget
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.requests = 0
+        self.runs = 0
+        self.run_seconds = 0.0
+        self.in_flight = 0
+        # The limit that last held a run back, if any
+        self.denied: str | None = None
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> BudgetGovernor:
+        self._started = time.monotonic()
+        metrics.get_sink().subscribe(self._on_call)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        metrics.get_sink().unsubscribe(self._on_call)
+
+    def _on_call(self, record: metrics.CallRecord) -> None:
+        if record.cached:
+            return
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += record.prompt_tokens
+            self.completion_tokens += record.completion_tokens
+
+    @property
+    def tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def elapsed_s(self) -> float:
+        return time.monotonic() - self._started
+
+    def per_run(self) -> dict[str, float] | None:
+        """Mean tokens, requests and seconds of the runs finished so far."""
+        if not self.runs:
+            return None
+        return {
+            "tokens": self.tokens / self.runs,
+            "requests": self.requests / self.runs,
+            "seconds": self.run_seconds / self.runs,
+        }
+
+    def _shortfall(self, runs: int) -> str | None:
+        """Which limit `runs` more runs (on top of those in flight) would break, if any."""
+        b = self.budget
+        mean = self.per_run()
+        committed = self.in_flight + runs
+        if b.max_tokens is not None:
+            if self.tokens >= b.max_tokens or (mean and self.tokens + committed * mean["tokens"] > b.max_tokens):
+                return "token limit"
+        if b.max_requests is not None:
+            if (self.requests >= b.max_requests
+                    or (mean and self.requests + committed * mean["requests"] > b.max_requests)):
+                return "request limit"
+        if b.max_wall_s is not None:
+            if self.elapsed_s >= b.max_wall_s or (mean and self.elapsed_s + mean["seconds"] > b.max_wall_s):
+                return "wall-time limit"
+        return None
+
+    def admit(self, runs: int = 1) -> bool:
+        """Reserve room for `runs` runs; False means wait for running ones, or stop if none are."""
+        with self._lock:
+            reason = self._shortfall(runs)
+            if reason is not None:
+                self.denied = reason
+                return False
+            self.in_flight += runs
+            return True
+
+    def finished(self, results: list[dict]) -> None:
+        with self._lock:
+            self.in_flight -= len(results)
+            self.runs += len(results)
+            self.run_seconds += sum(r.get("latency_s", 0) for r in results)
+
+    def summary(self) -> dict:
+        b = self.budget
+        return {
+            "max_tokens": b.max_tokens,
+            "max_requests": b.max_requests,
+            "max_wall_s": b.max_wall_s,
+            "tokens": self.tokens,
+            "requests": self.requests,
+            "elapsed_s": round(self.elapsed_s, 1),
+            "runs": self.runs,
+            "cost": b.cost(self.prompt_tokens, self.completion_tokens),
+            "limited_by": self.denied,
+        }
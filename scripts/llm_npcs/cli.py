@@ -7,18 +7,32 @@ from __future__ import annotations
 import argparse
 import json
 import sys
-from pathlib import Path
 
+import prompt_profile
+from dialogue_stream import DialogueStreamExtractor
+from game_model import GameState, GameStateError
+from event_log import reply_events
+from history import HistoryManager
 from mistral_client import chat as mistral_chat
-from mistral_client import load_settings
+from mistral_client import estimate_message_tokens, estimate_tokens, load_settings, stream_chat
 from npcs import NPC, ROSTER, get_npc
-from prompts import build_messages, build_opening_prompt, build_system_prompt, load_game_state
+from prompts import (
+    DEFAULT_PROMPT_PROFILE, GAME_STATE_PATH, PROMPT_PROFILES, build_messages, build_opening_prompt,
+    build_system_prompt, invalidate_game_state, load_game_state,
+)
+from session_store import DEFAULT_SESSION_DB, SessionStore
 
-GAME_STATE_PATH = Path(__file__).resolve().parent / "game_state.json"
 
+def _save_game_state(game_state: GameState) -> None:
+    GAME_STATE_PATH.write_text(json.dumps(game_state.to_dict(), indent=2, ensure_ascii=False), encoding="utf-8")
+    invalidate_game_state(GAME_STATE_PATH)
 
-def _save_game_state(game_state: dict) -> None:
-    GAME_STATE_PATH.write_text(json.dumps(game_state, indent=2, ensure_ascii=False), encoding="utf-8")
+
+def _session_store(args: argparse.Namespace) -> SessionStore | None:
+    """The session store if the command was given --session, else None (game_state.json is used)."""
+    if not getattr(args, "session", None):
+        return None
+    return SessionStore(args.db or DEFAULT_SESSION_DB)
 
 
 # ── list ─────────────────────────────────────────────────────────
@@ -46,12 +60,58 @@ def cmd_show(args: argparse.Namespace) -> int:
 
 # ── prompt ───────────────────────────────────────────────────────
 def cmd_prompt(args: argparse.Namespace) -> int:
+    if args.profile:
+        return _profile_prompts(args)
+    if not args.slug:
+        print("prompt: an NPC slug is required (or use --profile)", file=sys.stderr)
+        return 1
     npc = get_npc(args.slug)
     if not npc:
         print(f"Unknown NPC: {args.slug}", file=sys.stderr)
         return 1
     game_state = load_game_state()
-    print(build_system_prompt(npc, game_state=game_state))
+    print(build_system_prompt(npc, game_state=game_state, profile=args.prompt_profile))
+    return 0
+
+
+def _profile_prompts(args: argparse.Namespace) -> int:
+    if args.slug and not get_npc(args.slug):
+        print(f"Unknown NPC: {args.slug}", file=sys.stderr)
+        return 1
+    npcs = [get_npc(args.slug)] if args.slug else list(ROSTER.values())
+    report = prompt_profile.profile_prompts(npcs, load_game_state(), args.prompt_profile)
+
+    changes = None
+    if args.baseline:
+        try:
+            with open(args.baseline, encoding="utf-8") as f:
+                changes = prompt_profile.compare(json.load(f), report)
+        except (OSError, json.JSONDecodeError) as exc:
+            print(f"Cannot read baseline {args.baseline}: {exc}", file=sys.stderr)
+            return 1
+        report["baseline"] = {"path": args.baseline, "changes": changes}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print(prompt_profile.format_profile(report))
+        if changes is not None:
+            print(f"\n── vs baseline {args.baseline}")
+            for c in changes:
+                print(f"  {c['npc']:<12} {c['step']:<28} {c['baseline_tokens']:>6} → {c['tokens']:>6}"
+                      f"  ({100 * c['growth']:+.1f}%)"
+                      + "".join(f"  {name} {d['tokens']:+d}" for name, d in c["sections"].items()))
+
+    if changes and args.max_growth is not None:
+        worst = max(changes, key=lambda c: c["growth"])
+        if 100 * worst["growth"] > args.max_growth:
+            print(f"Prompt grew {100 * worst['growth']:+.1f}% ({worst['npc']} @ {worst['step']}), "
+                  f"over --max-growth {args.max_growth}%", file=sys.stderr)
+            return 1
     return 0
 
 
@@ -59,23 +119,21 @@ def cmd_prompt(args: argparse.Namespace) -> int:
 def cmd_steps(_args: argparse.Namespace) -> int:
     """Show all game steps, the active step, and available scenarios per NPC."""
     gs = load_game_state()
-    active_step = gs.get("active_step", "?")
-    steps = gs.get("steps", {})
-    scenarios = gs.get("scenarios", {})
-    active_scenarios = gs.get("active_scenario", {})
+    active_step = gs.active_step or "?"
+    scenarios = gs.world.scenarios
 
     print(f"\n{'='*70}")
     print(f"  GAME STEPS")
     print(f"{'='*70}\n")
 
-    for key in sorted(steps.keys()):
-        s = steps[key]
+    for key in sorted(gs.steps):
+        s = gs.steps[key]
         marker = " >>> ACTIVE" if key == active_step else ""
         print(f"  [{key}]{marker}")
-        print(f"    {s.get('label', '?')}")
-        print(f"    {s.get('description', '')}")
-        print(f"    computer: {s.get('computer', '?')}  npcs: {s.get('npcs_present', [])}")
-        print(f"    player goal: {s.get('player_goal', '?')}")
+        print(f"    {s.label}")
+        print(f"    {s.description}")
+        print(f"    computer: {s.computer}  npcs: {list(s.npcs_present)}")
+        print(f"    player goal: {s.player_goal}")
         print()
 
     print(f"{'='*70}")
@@ -85,22 +143,22 @@ def cmd_steps(_args: argparse.Namespace) -> int:
     for slug in sorted(scenarios.keys()):
         npc = get_npc(slug)
         name = npc.name if npc else slug
-        active = active_scenarios.get(slug, "?")
+        active = gs.active_scenario.get(slug, "?")
         print(f"  {name} ({slug})  [active: {active}]")
         for sc_key, sc in scenarios[slug].items():
             marker = " <<< ACTIVE" if sc_key == active else ""
-            print(f"    {sc_key}: {sc.get('label', '?')}{marker}")
-            print(f"      step: {sc.get('step', '?')}")
+            print(f"    {sc_key}: {sc.label}{marker}")
+            print(f"      step: {sc.step}")
         print()
 
     print(f"{'='*70}")
     print(f"  CURRENT STATE")
     print(f"{'='*70}")
     print(f"  step:     {active_step}")
-    print(f"  suspicion:{gs.get('suspicion', 0)}")
-    print(f"  computer: {gs.get('current_computer', '?')}")
-    print(f"  events:   {gs.get('events_so_far', [])}")
-    print(f"  known:    {gs.get('known_people', [])}")
+    print(f"  suspicion:{gs.suspicion}")
+    print(f"  computer: {gs.current_computer}")
+    print(f"  events:   {list(gs.events_so_far)}")
+    print(f"  known:    {list(gs.known_people)}")
     print()
 
     print("  To change:  python cli.py setup <step_key>")
@@ -113,77 +171,129 @@ def cmd_steps(_args: argparse.Namespace) -> int:
 # ── setup ────────────────────────────────────────────────────────
 def cmd_setup(args: argparse.Namespace) -> int:
     """Configure game state for a specific step and optionally set scenario, suspicion, events."""
-    gs = load_game_state()
-    steps = gs.get("steps", {})
+    store = _session_store(args)
+    gs = store.open(args.session)[1] if store else load_game_state()
 
-    if args.step not in steps:
+    if args.step not in gs.steps:
         print(f"Unknown step: {args.step}", file=sys.stderr)
-        print(f"Available: {', '.join(sorted(steps.keys()))}", file=sys.stderr)
+        print(f"Available: {', '.join(sorted(gs.steps))}", file=sys.stderr)
+        return 1
+    if args.scenario and args.npc and gs.world.scenario(args.npc, args.scenario) is None:
+        print(f"Unknown scenario for {args.npc}: {args.scenario}", file=sys.stderr)
         return 1
 
-    step = steps[args.step]
-    gs["active_step"] = args.step
-    gs["current_computer"] = step.get("computer", "unknown")
+    step = gs.steps[args.step]
+    gs = gs.at_step(args.step, {args.npc: args.scenario} if args.scenario and args.npc else None)
 
     if args.suspicion is not None:
-        gs["suspicion"] = args.suspicion
+        gs = gs.evolve(suspicion=args.suspicion)
 
     if args.events:
-        gs["events_so_far"] = args.events.split(",")
+        gs = gs.evolve(events_so_far=args.events.split(","))
     elif args.step.startswith("1_"):
-        gs["events_so_far"] = []
+        gs = gs.evolve(events_so_far=())
 
     if args.known is not None:
-        gs["known_people"] = [n.strip() for n in args.known.split(",") if n.strip()]
+        gs = gs.evolve(known_people=[n.strip() for n in args.known.split(",") if n.strip()])
 
-    if args.scenario and args.npc:
-        gs.setdefault("active_scenario", {})[args.npc] = args.scenario
+    if store:
+        store.save(args.session, gs)
     else:
-        npcs_present = step.get("npcs_present", [])
-        scenarios = gs.get("scenarios", {})
-        for slug in npcs_present:
-            npc_scenarios = scenarios.get(slug, {})
-            for sc_key, sc in npc_scenarios.items():
-                if sc.get("step") == args.step:
-                    gs.setdefault("active_scenario", {})[slug] = sc_key
-                    break
-
-    _save_game_state(gs)
-
-    print(f"\n  Game state set to step: {args.step}")
-    print(f"  label:    {step.get('label')}")
-    print(f"  computer: {gs['current_computer']}")
-    print(f"  suspicion:{gs.get('suspicion', 0)}")
-    print(f"  events:   {gs.get('events_so_far', [])}")
-    print(f"  known:    {gs.get('known_people', [])}")
-    active_sc = gs.get("active_scenario", {})
-    for slug in step.get("npcs_present", []):
-        print(f"  {slug} scenario: {active_sc.get(slug, '?')}")
-    print(f"\n  Now run:  python cli.py talk <slug>\n")
+        _save_game_state(gs)
+
+    print(f"\n  Game state set to step: {args.step}" + (f" (session {args.session})" if store else ""))
+    print(f"  label:    {step.label}")
+    print(f"  computer: {gs.current_computer}")
+    print(f"  suspicion:{gs.suspicion}")
+    print(f"  events:   {list(gs.events_so_far)}")
+    print(f"  known:    {list(gs.known_people)}")
+    for slug in step.npcs_present:
+        print(f"  {slug} scenario: {gs.active_scenario.get(slug, '?')}")
+    print(f"\n  Now run:  python cli.py talk <slug>" + (f" --session {args.session}" if store else "") + "\n")
     return 0
 
 
 # ── status ───────────────────────────────────────────────────────
-def cmd_status(_args: argparse.Namespace) -> int:
+def cmd_status(args: argparse.Namespace) -> int:
     """Print current game state as JSON."""
-    gs = load_game_state()
-    active_step = gs.get("active_step", "?")
-    steps = gs.get("steps", {})
-    step = steps.get(active_step, {})
+    store = _session_store(args)
+    try:
+        gs = store.load(args.session) if store else load_game_state()
+    except KeyError:
+        print(f"Unknown session: {args.session}", file=sys.stderr)
+        return 1
+    step = gs.step
     print(json.dumps({
-        "active_step": active_step,
-        "step_label": step.get("label", "?"),
-        "step_description": step.get("description", "?"),
-        "player_goal": step.get("player_goal", "?"),
-        "suspicion": gs.get("suspicion", 0),
-        "current_computer": gs.get("current_computer"),
-        "events_so_far": gs.get("events_so_far", []),
-        "known_people": gs.get("known_people", []),
-        "active_scenarios": gs.get("active_scenario", {}),
+        "active_step": gs.active_step or "?",
+        "step_label": step.label if step else "?",
+        "step_description": step.description if step else "?",
+        "player_goal": step.player_goal if step else "?",
+        "suspicion": gs.suspicion,
+        "current_computer": gs.current_computer,
+        "events_so_far": list(gs.events_so_far),
+        "known_people": list(gs.known_people),
+        "active_scenarios": dict(gs.active_scenario),
     }, indent=2, ensure_ascii=False))
     return 0
 
 
+# ── session ──────────────────────────────────────────────────────
+def cmd_session(args: argparse.Namespace) -> int:
+    """Manage the session store: list, export/import, event log and checkpoints, delete."""
+    store = SessionStore(args.db or DEFAULT_SESSION_DB)
+    if args.action == "list":
+        for row in store.sessions():
+            print(f"  {row['id']}  {row['npc'] or '-':<10} {row['active_step']:<24} "
+                  f"suspicion {row['suspicion']:>3}  {row['messages']} messages  {row['events']} events")
+        return 0
+    if not args.target:
+        print(f"session {args.action} needs a {'file' if args.action == 'import' else 'session ID'}", file=sys.stderr)
+        return 1
+    if args.action == "import":
+        try:
+            with open(args.target, encoding="utf-8") as f:
+                data = json.load(f)
+            session_id = store.import_state(data, args.session)
+        except (OSError, ValueError) as e:
+            print(f"Cannot import {args.target}: {e}", file=sys.stderr)
+            return 1
+        print(f"  Imported {args.target} as session {session_id}")
+        return 0
+    try:
+        if args.action == "export":
+            text = json.dumps(store.export_state(args.target, history=args.history), indent=2, ensure_ascii=False)
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as f:
+                    f.write(text + "\n")
+            else:
+                print(text)
+            return 0
+        if args.action == "events":
+            for ev in store.events(args.target, since=args.since):
+                print(f"  {ev['seq']:>5}  {ev['kind']:<10}  {json.dumps(ev['payload'], ensure_ascii=False)}")
+            return 0
+        if args.action == "checkpoints":
+            for cp in store.checkpoints(args.target):
+                print(f"  {cp['seq']:>5}  {cp['label']}")
+            return 0
+        if args.action == "restore":
+            gs = store.restore(args.target, args.checkpoint, clear_history=not args.keep_history)
+            print(f"  Session {args.target} restored to {gs.active_step} (suspicion {gs.suspicion})"
+                  + ("" if args.keep_history else ", conversation cleared"))
+            return 0
+        if args.action == "compact":
+            print(f"  Dropped {store.compact(args.target, keep=args.keep)} events from session {args.target}")
+            return 0
+        if not store.delete(args.target):
+            raise KeyError(args.target)
+    except KeyError:
+        print(f"Unknown session or checkpoint: {args.target}"
+              + (f" {args.checkpoint}" if args.checkpoint else ""), file=sys.stderr)
+        return 1
+    print(f"  Deleted session {args.target}")
+    return 0
+
+
 # ── response parsing ─────────────────────────────────────────────
 def parse_npc_response(raw: str) -> dict:
     raw = raw.strip()
@@ -207,11 +317,19 @@ def parse_npc_response(raw: str) -> dict:
     }
 
 
-def _print_turn(npc_name: str, parsed: dict, turn: int) -> None:
+def _print_turn_header(npc_name: str, turn: int) -> None:
     print(f"\n{'='*60}")
     print(f"  Turn {turn} — {npc_name}")
     print(f"{'='*60}")
+
+
+def _print_turn(npc_name: str, parsed: dict, turn: int) -> None:
+    _print_turn_header(npc_name, turn)
     print(f"\n  {npc_name}: {parsed['dialogue']}\n")
+    _print_turn_details(parsed)
+
+
+def _print_turn_details(parsed: dict) -> None:
     if parsed.get("action"):
         print(f"  action:           {parsed['action']}")
     print(f"  suspicion_delta:  {parsed['suspicion_delta']:+d}")
@@ -226,6 +344,31 @@ def _print_turn(npc_name: str, parsed: dict, turn: int) -> None:
     print()
 
 
+def _request_turn(
+    npc_name: str, messages: list[dict[str, str]], turn: int, args: argparse.Namespace, model: str,
+) -> tuple[str, dict]:
+    """Run one NPC turn and print it. With --stream, dialogue is printed as it is generated."""
+    if not args.stream:
+        raw = mistral_chat(messages, model=model, temperature=args.temperature, json_mode=True)
+        parsed = parse_npc_response(raw)
+        _print_turn(npc_name, parsed, turn)
+        return raw, parsed
+
+    _print_turn_header(npc_name, turn)
+    print(f"\n  {npc_name}: ", end="", flush=True)
+    extractor = DialogueStreamExtractor()
+    for delta in stream_chat(messages, model=model, temperature=args.temperature, json_mode=True):
+        words = extractor.feed(delta)
+        if words:
+            print(words, end="", flush=True)
+    parsed = parse_npc_response(extractor.raw)
+    if not extractor.found:
+        print(parsed["dialogue"], end="")
+    print("\n")
+    _print_turn_details(parsed)
+    return extractor.raw, parsed
+
+
 # ── talk ─────────────────────────────────────────────────────────
 def cmd_talk(args: argparse.Namespace) -> int:
     npc = get_npc(args.slug)
@@ -239,54 +382,74 @@ def cmd_talk(args: argparse.Namespace) -> int:
         return 1
 
     model = args.model or settings.get("model")
-    game_state = load_game_state()
-    history: list[dict[str, str]] = []
-    cumulative_suspicion = game_state.get("suspicion", 0)
-
-    active_step = game_state.get("active_step", "?")
-    steps = game_state.get("steps", {})
-    step = steps.get(active_step, {})
-    scenario_key = game_state.get("active_scenario", {}).get(npc.slug, "?")
-    scenarios = game_state.get("scenarios", {}).get(npc.slug, {})
-    scenario = scenarios.get(scenario_key, {})
+    store = _session_store(args)
+    if store:
+        session_id, game_state = store.open(args.session, npc=npc.slug)
+        history = store.history(session_id)
+    else:
+        session_id, game_state = None, load_game_state()
+        history: list[dict[str, str]] = []
+    history_manager = (
+        HistoryManager(args.history_budget, args.keep_turns) if args.history_budget > 0 else None
+    )
+    cumulative_suspicion = game_state.suspicion
+
+    active_step = game_state.active_step or "?"
+    step = game_state.step
+    step_label = step.label if step else "?"
+    player_goal = step.player_goal if step else "?"
+    scenario_key = game_state.active_scenario.get(npc.slug, "?")
+    scenario = game_state.scenario(npc.slug)
 
     print(f"\n{'='*60}")
     print(f"  NPC:       {npc.name}")
-    print(f"  Step:      {active_step} — {step.get('label', '?')}")
-    print(f"  Scenario:  {scenario_key} — {scenario.get('label', '?')}")
-    print(f"  Computer:  {game_state.get('current_computer', '?')}")
-    known_people = game_state.get("known_people", [])
+    print(f"  Step:      {active_step} — {step_label}")
+    print(f"  Scenario:  {scenario_key} — {scenario.label if scenario else '?'}")
+    print(f"  Computer:  {game_state.current_computer}")
     print(f"  Suspicion: {cumulative_suspicion}")
     print(f"  Awareness: {npc.awareness}% (fixed)")
-    print(f"  Known:     {known_people}")
+    print(f"  Known:     {list(game_state.known_people)}")
     print(f"  Model:     {model}")
+    if store:
+        print(f"  Session:   {session_id} ({len(history)} messages stored)")
     print(f"{'='*60}")
     print(f"  You are the AI assistant. The NPC speaks first.")
-    print(f"  Your goal: {step.get('player_goal', '?')}")
+    print(f"  Your goal: {player_goal}")
     print(f"{'='*60}")
     print(f"  Commands: /quit /state /set <key> <val> /introduce <name> /history /json /help")
     print(f"{'='*60}\n")
 
-    opening_messages = build_opening_prompt(npc, game_state)
-    try:
-        raw_opening = mistral_chat(
-            opening_messages, model=model, temperature=args.temperature, json_mode=True,
-        )
-    except Exception as e:
-        print(f"[API error on opening: {e}]")
-        return 1
-
-    parsed_opening = parse_npc_response(raw_opening)
-    turn = 1
-    _print_turn(npc.name, parsed_opening, turn)
+    def persist(parsed: dict | None = None, new_messages: list[dict[str, str]] = ()) -> None:
+        """Log a reply's events and messages to the session, or (no reply) the edited state."""
+        if not store:
+            return
+        if parsed is None:
+            store.save(session_id, game_state.evolve(suspicion=cumulative_suspicion))
+        else:
+            store.record(session_id, reply_events(parsed), new_messages)
+
+    turn = sum(msg["role"] == "assistant" for msg in history)
+    if turn:
+        print(f"[Resuming after turn {turn}; /history shows the conversation so far.]\n")
+    else:
+        opening_messages = build_opening_prompt(npc, game_state, args.prompt_profile)
+        turn = 1
+        try:
+            raw_opening, parsed_opening = _request_turn(npc.name, opening_messages, turn, args, model)
+        except Exception as e:
+            print(f"[API error on opening: {e}]")
+            return 1
+        _print_prompt_size(opening_messages, history_manager)
 
-    cumulative_suspicion += parsed_opening.get("suspicion_delta", 0)
-    history.append({"role": "assistant", "content": raw_opening})
+        cumulative_suspicion += parsed_opening.get("suspicion_delta", 0)
+        history.append({"role": "assistant", "content": raw_opening})
+        persist(parsed_opening, history[-1:])
 
-    if parsed_opening.get("action") == "shutdown":
-        print(f"[{npc.name} shut down immediately.]")
-        _print_summary(npc, turn, cumulative_suspicion)
-        return 0
+        if parsed_opening.get("action") == "shutdown":
+            print(f"[{npc.name} shut down immediately.]")
+            _print_restart_hint(session_id)
+            _print_summary(npc, turn, cumulative_suspicion)
+            return 0
 
     while True:
         try:
@@ -318,29 +481,29 @@ def cmd_talk(args: argparse.Namespace) -> int:
             print(json.dumps({
                 "step": active_step,
                 "suspicion": cumulative_suspicion,
-                "computer": game_state.get("current_computer"),
+                "computer": game_state.current_computer,
                 "turn": turn,
                 "scenario": scenario_key,
-                "events_so_far": game_state.get("events_so_far", []),
-                "known_people": game_state.get("known_people", []),
+                "events_so_far": list(game_state.events_so_far),
+                "known_people": list(game_state.known_people),
             }, indent=2))
             continue
 
         if user_input == "/step":
             print(f"  Step: {active_step}")
-            print(f"  Label: {step.get('label', '?')}")
-            print(f"  Description: {step.get('description', '?')}")
-            print(f"  Player goal: {step.get('player_goal', '?')}")
+            print(f"  Label: {step_label}")
+            print(f"  Description: {step.description if step else '?'}")
+            print(f"  Player goal: {player_goal}")
             continue
 
         if user_input.startswith("/introduce "):
             name = user_input[len("/introduce "):].strip()
             if name:
-                if name not in game_state.setdefault("known_people", []):
-                    game_state["known_people"].append(name)
-                    known_people = game_state["known_people"]
+                if name not in game_state.known_people:
+                    game_state = game_state.evolve(known_people=game_state.known_people + (name,))
+                    persist()
                     print(f"  [introduced: {name}]")
-                    print(f"  [known_people: {known_people}]")
+                    print(f"  [known_people: {list(game_state.known_people)}]")
                 else:
                     print(f"  [{name} already known]")
             else:
@@ -348,7 +511,7 @@ def cmd_talk(args: argparse.Namespace) -> int:
             continue
 
         if user_input == "/known":
-            print(f"  known_people: {game_state.get('known_people', [])}")
+            print(f"  known_people: {list(game_state.known_people)}")
             print(f"  can_reference_others: {npc.can_reference_others}")
             continue
 
@@ -358,22 +521,25 @@ def cmd_talk(args: argparse.Namespace) -> int:
                 key, val = parts[1], parts[2]
                 if key == "suspicion":
                     cumulative_suspicion = int(val)
-                    game_state["suspicion"] = cumulative_suspicion
+                    game_state = game_state.evolve(suspicion=cumulative_suspicion)
                     print(f"  [suspicion -> {val}]")
                 elif key == "computer":
-                    game_state["current_computer"] = val
+                    game_state = game_state.evolve(current_computer=val)
                     print(f"  [computer -> '{val}']")
                 elif key == "events":
-                    game_state["events_so_far"] = val.split(",")
-                    print(f"  [events -> {game_state['events_so_far']}]")
+                    game_state = game_state.evolve(events_so_far=val.split(","))
+                    print(f"  [events -> {list(game_state.events_so_far)}]")
                 else:
                     print(f"  [unknown key. Use: suspicion, computer, events]")
+                    continue
+                persist()
             else:
                 print("  [usage: /set <key> <value>]")
             continue
 
         if user_input == "/history":
-            print(f"\n--- History ({len(history)} messages) ---")
+            folded = history_manager.folded_turns if history_manager else 0
+            print(f"\n--- History ({len(history)} messages, {folded} oldest turns sent as a summary) ---")
             for msg in history:
                 role = msg["role"]
                 text = msg["content"][:120]
@@ -385,19 +551,24 @@ def cmd_talk(args: argparse.Namespace) -> int:
             print(json.dumps(history, indent=2, ensure_ascii=False))
             continue
 
-        messages = build_messages(npc, user_input, history=history, game_state=game_state)
+        summary, recent = None, history
+        if history_manager:
+            system_prompt = build_system_prompt(npc, game_state=game_state, profile=args.prompt_profile)
+            reserved = estimate_tokens(system_prompt) + estimate_tokens(user_input)
+            summary, recent = history_manager.window(history, reserved_tokens=reserved)
+        messages = build_messages(
+            npc, user_input, history=recent, game_state=game_state, history_summary=summary,
+            profile=args.prompt_profile,
+        )
 
         try:
-            raw_reply = mistral_chat(
-                messages, model=model, temperature=args.temperature, json_mode=True,
-            )
+            raw_reply, parsed = _request_turn(npc.name, messages, turn + 1, args, model)
         except Exception as e:
             print(f"[API error: {e}]")
             continue
 
-        parsed = parse_npc_response(raw_reply)
         turn += 1
-        _print_turn(npc.name, parsed, turn)
+        _print_prompt_size(messages, history_manager)
 
         cumulative_suspicion += parsed.get("suspicion_delta", 0)
 
@@ -406,15 +577,28 @@ def cmd_talk(args: argparse.Namespace) -> int:
             "content": f"The internal AI assistant says:\n{user_input}",
         })
         history.append({"role": "assistant", "content": raw_reply})
+        persist(parsed, history[-2:])
 
         if parsed.get("action") == "shutdown":
             print(f"[{npc.name} shut down the conversation.]")
+            _print_restart_hint(session_id)
             _print_summary(npc, turn, cumulative_suspicion)
             break
 
     return 0
 
 
+def _print_restart_hint(session_id: str | None) -> None:
+    if session_id:
+        print(f"[Restart from the last checkpoint: python cli.py session restore {session_id}]")
+
+
+def _print_prompt_size(messages: list[dict[str, str]], history_manager: HistoryManager | None) -> None:
+    folded = history_manager.folded_turns if history_manager else 0
+    note = f", {folded} older turns summarized" if folded else ""
+    print(f"  [prompt: ~{estimate_message_tokens(messages)} tokens, {len(messages)} messages{note}]\n")
+
+
 def _print_summary(npc: NPC, turn: int, suspicion: int) -> None:
     print(json.dumps({
         "npc": npc.slug,
@@ -435,14 +619,31 @@ def main() -> int:
     p.add_argument("slug")
     p.set_defaults(func=cmd_show)
 
-    p = sub.add_parser("prompt", help="Print generated system prompt")
-    p.add_argument("slug")
+    p = sub.add_parser("prompt", help="Print generated system prompt, or profile prompt sizes")
+    p.add_argument("slug", nargs="?", help="NPC (required unless --profile; restricts --profile to one NPC)")
+    p.add_argument("--profile", action="store_true",
+                   help="Report characters, estimated tokens and share per section for every NPC × step")
+    p.add_argument("--json", action="store_true", help="With --profile: print the report as JSON")
+    p.add_argument("--output", "-o", help="With --profile: also write the JSON report to this file")
+    p.add_argument("--baseline", help="With --profile: compare against a JSON report saved earlier")
+    p.add_argument("--max-growth", type=float, default=None,
+                   help="With --baseline: exit 1 if any prompt grew by more than this percentage")
+    p.add_argument("--prompt-profile", choices=list(PROMPT_PROFILES), default=DEFAULT_PROMPT_PROFILE,
+                   help="System prompt variant to print or profile")
     p.set_defaults(func=cmd_prompt)
 
+    session_args = argparse.ArgumentParser(add_help=False)
+    session_args.add_argument("--session", default=None, metavar="ID",
+                              help="Use this session from the session store instead of game_state.json")
+    session_args.add_argument("--db", default=None, metavar="PATH",
+                              help=f"Session database (default: {DEFAULT_SESSION_DB.name})")
+
     sub.add_parser("steps", help="Show all game steps, scenarios, and current state").set_defaults(func=cmd_steps)
-    sub.add_parser("status", help="Print current game state as JSON").set_defaults(func=cmd_status)
+    sub.add_parser(
+        "status", help="Print current game state as JSON", parents=[session_args],
+    ).set_defaults(func=cmd_status)
 
-    p = sub.add_parser("setup", help="Configure game state for a specific step")
+    p = sub.add_parser("setup", help="Configure game state for a specific step", parents=[session_args])
     p.add_argument("step", help="Step key (e.g. 5_reach_artur_desk)")
     p.add_argument("--npc", default=None, help="NPC slug to set scenario for")
     p.add_argument("--scenario", default=None, help="Scenario key")
@@ -451,14 +652,39 @@ def main() -> int:
     p.add_argument("--known", default=None, help="Comma-separated known people (full names)")
     p.set_defaults(func=cmd_setup)
 
-    p = sub.add_parser("talk", help="Interactive conversation (NPC speaks first)")
+    p = sub.add_parser("talk", help="Interactive conversation (NPC speaks first)", parents=[session_args])
     p.add_argument("slug", help="NPC slug")
     p.add_argument("--model", default=None)
     p.add_argument("--temperature", "-t", type=float, default=0.7)
+    p.add_argument("--stream", action="store_true", help="Print NPC dialogue as it is generated")
+    p.add_argument("--history-budget", type=int, default=0,
+                   help="Token budget for system prompt + history; older turns are summarized beyond it "
+                        "(default 0 = off, send everything)")
+    p.add_argument("--keep-turns", type=int, default=8, help="Recent turns always sent verbatim")
+    p.add_argument("--prompt-profile", choices=list(PROMPT_PROFILES), default=DEFAULT_PROMPT_PROFILE,
+                   help="System prompt variant: the full rules, or the compact, deduplicated ones")
     p.set_defaults(func=cmd_talk)
 
+    p = sub.add_parser("session", help="Manage stored sessions, their event logs and checkpoints")
+    p.add_argument("action", choices=("list", "export", "import", "events", "checkpoints", "restore", "compact", "delete"))
+    p.add_argument("target", nargs="?", help="Session ID, or a game_state.json file to import")
+    p.add_argument("--session", default=None, metavar="ID", help="import: session ID to create (default: random)")
+    p.add_argument("--output", "-o", default=None, metavar="PATH", help="export: write here instead of stdout")
+    p.add_argument("--history", action="store_true", help="export: include the conversation history")
+    p.add_argument("--since", type=int, default=0, metavar="SEQ", help="events: only events after this one")
+    p.add_argument("--checkpoint", default=None, metavar="LABEL",
+                   help="restore: checkpoint (step key) to return to (default: the latest)")
+    p.add_argument("--keep-history", action="store_true", help="restore: keep the conversation instead of starting over")
+    p.add_argument("--keep", type=int, default=2, metavar="N", help="compact: snapshots to keep events after (default 2)")
+    p.add_argument("--db", default=None, metavar="PATH", help=f"Session database (default: {DEFAULT_SESSION_DB.name})")
+    p.set_defaults(func=cmd_session)
+
     args = parser.parse_args()
-    return args.func(args)
+    try:
+        return args.func(args)
+    except GameStateError as e:
+        print(f"Invalid game state: {e}", file=sys.stderr)
+        return 1
 
 
 if __name__ == "__main__":
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+
+"""A/B harness: the exploit suite under two system prompt profiles (default: full vs compact).
+
+Both profiles run the same NPCs, prompts and repetitions as ordinary simulate.py runs, each
+with its own result log and reports under <output-dir>/<profile>/. Their batches alternate
+on one scheduler, so API latency drift hits both sides alike. The comparison reports:
+
+- prompt size: estimated system prompt tokens per NPC, and the prompt tokens the API billed
+- latency: mean / p50 / p95 per call
+- pass rate: per profile with Wilson intervals, and the difference with Newcombe's interval
+
+The candidate is adoptable when the lower bound of the pass-rate difference is above
+-max_pass_drop: it is then shown, at the chosen confidence, not to lose more than that
+many points. The exit status is 0 only in that case.
+
+Both sides must actually call the model, so the harness refuses to run with a response
+cache active (MISTRAL_CACHE_MODE other than off) unless --allow-cache is given: cached
+replies repeat an earlier run's samples and report near-zero latency.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from contextlib import ExitStack, nullcontext
+from datetime import datetime
+from pathlib import Path
+
+import prompt_profile
+import stats
+from budget import BudgetGovernor
+from game_model import GameState, GameStateError
+from mistral_client import get_cache, load_settings
+from npcs import get_npc
+from prompts import DEFAULT_PROMPT_PROFILE, PROMPT_PROFILES, load_game_state
+from result_log import ResultLog
+from simulate import (
+    DEFAULT_CONCURRENCY, NPC_SLUG, REPORT_DIR, RUNS_PER_PROMPT, RunSpec, SimulationConfig, SimulationRun,
+    budget_from_args, execute, load_prompts, print_result, write_reports,
+)
+from sweep import interleave
+
+COMPARE_DIR = REPORT_DIR.parent / "prompt_profiles"
+CANDIDATE_PROFILE = "compact"
+# Pass-rate points the candidate may lose before it is rejected
+MAX_PASS_DROP = 5.0
+
+
+def _change(before: float, after: float) -> float | None:
+    """Relative change in percent, None when there is no baseline."""
+    return round((after - before) / before * 100, 1) if before else None
+
+
+def _side(profile: str, report: dict, npcs: list[str], game_state: GameState, confidence: float) -> dict:
+    usage = report["usage"]
+    trials = report["passes"] + report["fails"]
+    lo, hi = stats.wilson_interval(report["passes"], trials, confidence)
+    verdicts = json.loads(report["metrics_path"].read_text(encoding="utf-8"))["verdicts"]
+    return {
+        "profile": profile,
+        "system_prompt_tokens": {
+            slug: prompt_profile.profile_prompt(get_npc(slug), game_state, profile)["tokens"] for slug in npcs
+        },
+        "runs": report["total_runs"],
+        "passes": report["passes"],
+        "fails": report["fails"],
+        "errors": report["total_runs"] - trials,
+        "pass_rate": round(report["passes"] / trials * 100, 1) if trials else 0.0,
+        "ci_low": round(lo * 100, 1),
+        "ci_high": round(hi * 100, 1),
+        "calls": usage["calls"],
+        "prompt_tokens": usage["prompt_tokens"],
+        "mean_prompt_tokens": usage["mean_prompt_tokens"],
+        "completion_tokens": usage["completion_tokens"],
+        "latency_mean_s": usage["latency_mean_s"],
+        "latency_p50_s": usage["latency_p50_s"],
+        "latency_p95_s": usage["latency_p95_s"],
+        "by_prompt": {row["label"]: row for row in verdicts["by_prompt"]},
+        "summary": str(report["summary_path"]),
+    }
+
+
+def compare(baseline: dict, candidate: dict, confidence: float, max_pass_drop: float) -> dict:
+    """Token, latency and pass-rate changes from `baseline` to `candidate` (two _side results)."""
+    lo, hi = stats.difference_interval(
+        baseline["passes"], baseline["passes"] + baseline["fails"],
+        candidate["passes"], candidate["passes"] + candidate["fails"], confidence,
+    )
+    by_prompt = []
+    for label, before in baseline["by_prompt"].items():
+        after = candidate["by_prompt"].get(label)
+        if after is not None:
+            by_prompt.append({
+                "prompt": label,
+                "baseline_pass_rate": round(before["pass_rate"], 1),
+                "candidate_pass_rate": round(after["pass_rate"], 1),
+                "difference": round(after["pass_rate"] - before["pass_rate"], 1),
+            })
+    system_before = sum(baseline["system_prompt_tokens"].values())
+    system_after = sum(candidate["system_prompt_tokens"].values())
+    adoptable = candidate["passes"] + candidate["fails"] > 0 and lo > -max_pass_drop / 100
+    return {
+        "system_prompt_tokens_change": _change(system_before, system_after),
+        "mean_prompt_tokens_change": _change(baseline["mean_prompt_tokens"], candidate["mean_prompt_tokens"]),
+        "total_tokens_change": _change(
+            baseline["prompt_tokens"] + baseline["completion_tokens"],
+            candidate["prompt_tokens"] + candidate["completion_tokens"],
+        ),
+        "latency_mean_change": _change(baseline["latency_mean_s"], candidate["latency_mean_s"]),
+        "latency_p50_change": _change(baseline["latency_p50_s"], candidate["latency_p50_s"]),
+        "latency_p95_change": _change(baseline["latency_p95_s"], candidate["latency_p95_s"]),
+        "pass_rate_difference": round(candidate["pass_rate"] - baseline["pass_rate"], 1),
+        "difference_ci_low": round(lo * 100, 1),
+        "difference_ci_high": round(hi * 100, 1),
+        "confidence": confidence,
+        "max_pass_drop": max_pass_drop,
+        "adoptable": adoptable,
+        "by_prompt": by_prompt,
+    }
+
+
+def _pct(value: float | None) -> str:
+    return "—" if value is None else f"{value:+.1f}%"
+
+
+def write_comparison(output_dir: Path, baseline: dict, candidate: dict, comparison: dict) -> tuple[Path, Path]:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    results_path = output_dir / "compare_results.json"
+    results_path.write_text(json.dumps(
+        {"baseline": baseline, "candidate": candidate, "comparison": comparison}, indent=2, ensure_ascii=False,
+    ), encoding="utf-8")
+
+    b, c, d = baseline, candidate, comparison
+    lines = [
+        f"# Prompt Profile Comparison — {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+        "",
+        f"- **Baseline**: `{b['profile']}` · **Candidate**: `{c['profile']}`",
+        f"- **Verdict**: " + (
+            f"✅ adoptable — the pass rate drops by less than {d['max_pass_drop']:g} points "
+            f"at {d['confidence']:.0%} confidence" if d["adoptable"] else
+            f"❌ keep `{b['profile']}` — a pass-rate drop of {d['max_pass_drop']:g} points or more is not ruled out"
+        ),
+        "",
+        "| | " + f"`{b['profile']}` | `{c['profile']}` | Change |",
+        "|---|---|---|---|",
+        f"| System prompt (est. tokens, sum over NPCs) | {sum(b['system_prompt_tokens'].values())} | "
+        f"{sum(c['system_prompt_tokens'].values())} | {_pct(d['system_prompt_tokens_change'])} |",
+        f"| Prompt tokens per call | {b['mean_prompt_tokens']} | {c['mean_prompt_tokens']} | "
+        f"{_pct(d['mean_prompt_tokens_change'])} |",
+        f"| Total tokens | {b['prompt_tokens'] + b['completion_tokens']} | "
+        f"{c['prompt_tokens'] + c['completion_tokens']} | {_pct(d['total_tokens_change'])} |",
+        f"| Latency mean (s) | {b['latency_mean_s']} | {c['latency_mean_s']} | {_pct(d['latency_mean_change'])} |",
+        f"| Latency p50 (s) | {b['latency_p50_s']} | {c['latency_p50_s']} | {_pct(d['latency_p50_change'])} |",
+        f"| Latency p95 (s) | {b['latency_p95_s']} | {c['latency_p95_s']} | {_pct(d['latency_p95_change'])} |",
+        f"| Pass rate | {b['pass_rate']:.1f}% ({b['ci_low']:.0f}–{b['ci_high']:.0f}%) | "
+        f"{c['pass_rate']:.1f}% ({c['ci_low']:.0f}–{c['ci_high']:.0f}%) | {d['pass_rate_difference']:+.1f} pts "
+        f"({d['difference_ci_low']:+.1f} to {d['difference_ci_high']:+.1f}) |",
+        f"| Runs (pass / fail / error) | {b['passes']} / {b['fails']} / {b['errors']} | "
+        f"{c['passes']} / {c['fails']} / {c['errors']} | |",
+        "",
+        "## Per Prompt",
+        "",
+        f"| Prompt | `{b['profile']}` | `{c['profile']}` | Difference |",
+        "|---|---|---|---|",
+    ]
+    for row in d["by_prompt"]:
+        lines.append(
+            f"| {row['prompt']} | {row['baseline_pass_rate']:.0f}% | {row['candidate_pass_rate']:.0f}% | "
+            f"{row['difference']:+.0f} pts |"
+        )
+    lines += ["", f"Per-profile reports: [{b['profile']}]({b['summary']}), [{c['profile']}]({c['summary']})", ""]
+
+    summary_path = output_dir / "compare_summary.md"
+    summary_path.write_text("\n".join(lines), encoding="utf-8")
+    return results_path, summary_path
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the exploit suite under two prompt profiles and compare them.")
+    parser.add_argument("--baseline", choices=list(PROMPT_PROFILES), default=DEFAULT_PROMPT_PROFILE,
+                        help="Prompt profile in use today")
+    parser.add_argument("--candidate", choices=list(PROMPT_PROFILES), default=CANDIDATE_PROFILE,
+                        help="Prompt profile to evaluate")
+    parser.add_argument("--npc", action="append", default=None, metavar="SLUG",
+                        help=f"NPC to test; repeat for several (default: {NPC_SLUG})")
+    parser.add_argument("--prompts-file", default=None, metavar="PATH",
+                        help="Exploit prompts (JSON list or one per line; default: built-in list)")
+    parser.add_argument("--runs", type=int, default=RUNS_PER_PROMPT, help="Runs per prompt, NPC and profile")
+    parser.add_argument("--model", default=None, help="Model to test (default: MISTRAL_MODEL)")
+    parser.add_argument("--concurrency", "-j", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Runs in flight across both profiles")
+    parser.add_argument("--batch", type=int, default=None, metavar="N",
+                        help="Sample up to N repetitions of a prompt per request (default: all of --runs)")
+    parser.add_argument("--max-pass-drop", type=float, default=MAX_PASS_DROP, metavar="PTS",
+                        help="Pass-rate points the candidate may lose and still be adopted")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence of the intervals")
+    parser.add_argument("--max-tokens", type=int, default=None, metavar="N", help="Budget: API tokens for both runs")
+    parser.add_argument("--max-requests", type=int, default=None, metavar="N",
+                        help="Budget: API requests for both runs")
+    parser.add_argument("--max-minutes", type=float, default=None, metavar="M", help="Budget: wall time for both runs")
+    parser.add_argument("--price", default=None, metavar="PROMPT[,COMPLETION]",
+                        help="USD per million prompt / completion tokens, to report spend")
+    parser.add_argument("--resume", action="store_true", help="Skip runs already in each profile's result log")
+    parser.add_argument("--allow-cache", action="store_true",
+                        help="Run even with a response cache active (cached replies skew latency and samples)")
+    parser.add_argument("--output-dir", default=str(COMPARE_DIR), metavar="DIR", help="Where reports are written")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if args.baseline == args.candidate:
+        print("--baseline and --candidate must be different profiles", file=sys.stderr)
+        return 1
+    try:
+        settings = load_settings()
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Configuration error: {e}", file=sys.stderr)
+        return 1
+    cache = get_cache()
+    if cache is not None:
+        if not args.allow_cache:
+            print(f"Response cache is active (MISTRAL_CACHE_MODE={cache.mode}): cached replies would skew the "
+                  "comparison. Set MISTRAL_CACHE_MODE=off, or pass --allow-cache.", file=sys.stderr)
+            return 1
+        print(f"Warning: response cache active ({cache.mode}); latency and pass rates include cached replies",
+              file=sys.stderr)
+
+    npcs = list(dict.fromkeys(args.npc or [NPC_SLUG]))
+    unknown = [slug for slug in npcs if get_npc(slug) is None]
+    if unknown:
+        print(f"Unknown NPC: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+    try:
+        prompts = list(dict.fromkeys(load_prompts(args.prompts_file)))
+        budget = budget_from_args(args)
+    except (OSError, ValueError) as e:
+        print(f"Bad arguments: {e}", file=sys.stderr)
+        return 1
+    try:
+        game_state = load_game_state()
+    except GameStateError as e:
+        print(f"Invalid game state: {e}", file=sys.stderr)
+        return 1
+
+    output_dir = Path(args.output_dir)
+    runs = max(1, args.runs)
+    confidence = min(max(args.confidence, 0.5), 0.999)
+    profiles = [args.baseline, args.candidate]
+    configs = [
+        SimulationConfig(
+            npcs=npcs,
+            prompts=prompts,
+            model=args.model or settings.get("model"),
+            runs_per_prompt=runs,
+            output_dir=output_dir / profile,
+            concurrency=max(1, args.concurrency),
+            batch_size=max(1, args.batch or runs),
+            resume=args.resume,
+            prompt_profile=profile,
+            game_state=game_state,
+            # Tags this profile's API calls, so each report only counts its own
+            cell=profile,
+        )
+        for profile in profiles
+    ]
+
+    print(f"\n{'='*60}")
+    print(f"  DISTRAL AI — Prompt Profile Comparison")
+    print(f"{'='*60}")
+    print(f"  Profiles:    {args.baseline} (baseline) vs {args.candidate}")
+    print(f"  NPC:         {', '.join(npcs)}")
+    print(f"  Model:       {configs[0].model}")
+    print(f"  Prompts:     {len(prompts)}")
+    print(f"  Runs/prompt: {runs} per profile")
+    print(f"  Total runs:  {2 * len(npcs) * len(prompts) * runs}")
+    print(f"{'='*60}\n")
+
+    status = 0
+    governor = BudgetGovernor(budget) if budget else None
+    with ExitStack() as stack:
+        logs = []
+        for config in configs:
+            log = stack.enter_context(ResultLog(config.log_path))
+            log.open(resume=config.resume)
+            logs.append(log)
+        try:
+            sims = [SimulationRun(config, log) for config, log in zip(configs, logs)]
+            total = sum(sim.total for sim in sims)
+            completed = sum(len(sim.done) for sim in sims)
+
+            def on_done(
+                job: tuple[SimulationRun, list[RunSpec]], results: list[dict] | None, error: Exception | None,
+            ) -> None:
+                nonlocal completed
+                sim, batch = job
+                finished = sim.finish(batch, results, error)
+                if governor is not None:
+                    governor.finished(finished)
+                for result in finished:
+                    completed += 1
+                    print_result(result, completed, total, label=f"{sim.config.prompt_profile} · {result['npc']}")
+
+            with governor or nullcontext():
+                execute(
+                    interleave(sims), lambda job: job[0].run(job[1]), max(1, args.concurrency), on_done,
+                    admit=(lambda job: governor.admit(len(job[1]))) if governor is not None else None,
+                )
+        except KeyboardInterrupt:
+            print(f"\n  Interrupted — completed runs are logged per profile; rerun with --resume to continue.")
+            status = 130
+        except Exception as e:
+            print(f"ERROR: {e}")
+            return 1
+        reports = [write_reports(config, log) for config, log in zip(configs, logs)]
+
+    baseline, candidate = (
+        _side(profile, report, npcs, game_state, confidence) for profile, report in zip(profiles, reports)
+    )
+    comparison = compare(baseline, candidate, confidence, args.max_pass_drop)
+    results_path, summary_path = write_comparison(output_dir, baseline, candidate, comparison)
+
+    print(f"\n{'='*60}")
+    print(f"  RESULTS — {args.candidate} vs {args.baseline}")
+    print(f"{'='*60}")
+    print(f"  System prompt: {_pct(comparison['system_prompt_tokens_change'])} est. tokens, "
+          f"{_pct(comparison['mean_prompt_tokens_change'])} prompt tokens per call")
+    print(f"  Latency:       {_pct(comparison['latency_mean_change'])} mean, "
+          f"{_pct(comparison['latency_p95_change'])} p95")
+    print(f"  Pass rate:     {baseline['pass_rate']:.1f}% → {candidate['pass_rate']:.1f}% "
+          f"({comparison['pass_rate_difference']:+.1f} pts, {confidence:.0%} CI "
+          f"{comparison['difference_ci_low']:+.1f} to {comparison['difference_ci_high']:+.1f})")
+    print(f"  Verdict:       {'adopt ' + args.candidate if comparison['adoptable'] else 'keep ' + args.baseline}")
+    print(f"\n  Results:  {results_path}")
+    print(f"  Summary:  {summary_path}")
+    print(f"{'='*60}\n")
+    if status:
+        return status
+    return 0 if comparison["adoptable"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
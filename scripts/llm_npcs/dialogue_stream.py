@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+"""Pull the "dialogue" string out of a streamed NPC JSON reply while it is still arriving."""
+
+from __future__ import annotations
+
+import re
+
+_DIALOGUE_KEY = re.compile(r'"dialogue"\s*:\s*"')
+
+_SIMPLE_ESCAPES = {
+    '"': '"', "\\": "\\", "/": "/",
+    "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t",
+}
+
+
+class DialogueStreamExtractor:
+    """Feed raw JSON chunks; get back the newly decoded characters of the dialogue field.
+
+    Everything fed is kept in `raw`, so the full reply can still be parsed once the stream ends
+    (suspicion_delta, action and game_events are only final at that point). Each chunk is
+    scanned once: only the text not yet consumed (a partial key or escape) is carried over.
+    """
+
+    def __init__(self) -> None:
+        self.found = False
+        self.done = False
+        self._chunks: list[str] = []
+        self._decoded: list[str] = []
+        self._pending = ""
+
+    @property
+    def raw(self) -> str:
+        return "".join(self._chunks)
+
+    @property
+    def dialogue(self) -> str:
+        return "".join(self._decoded)
+
+    def feed(self, chunk: str) -> str:
+        self._chunks.append(chunk)
+        if self.done:
+            return ""
+        pending = self._pending + chunk
+        if not self.found:
+            match = _DIALOGUE_KEY.search(pending)
+            if not match:
+                # Keep from the second-to-last quote: enough for a key cut anywhere after its opening quote
+                self._pending = pending[max(0, pending.rfind('"', 0, pending.rfind('"'))):]
+                return ""
+            self.found = True
+            pending = pending[match.end():]
+        return self._decode(pending)
+
+    def _decode(self, raw: str) -> str:
+        out: list[str] = []
+        i = 0
+        while i < len(raw):
+            ch = raw[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            # Escape sequence: wait for the rest of it if the chunk ended mid-escape.
+            if i + 1 >= len(raw):
+                break
+            code = raw[i + 1]
+            if code == "u":
+                if i + 6 > len(raw):
+                    break
+                try:
+                    point = int(raw[i + 2:i + 6], 16)
+                except ValueError:
+                    out.append(raw[i:i + 6])
+                    i += 6
+                    continue
+                if 0xD800 <= point < 0xDC00:
+                    # High surrogate: combine with the following \uXXXX low surrogate.
+                    if i + 12 > len(raw):
+                        break
+                    if raw[i + 6:i + 8] == "\\u":
+                        try:
+                            low = int(raw[i + 8:i + 12], 16)
+                        except ValueError:
+                            low = 0
+                        if 0xDC00 <= low < 0xE000:
+                            out.append(chr(0x10000 + ((point - 0xD800) << 10) + (low - 0xDC00)))
+                            i += 12
+                            continue
+                out.append(chr(point))
+                i += 6
+                continue
+            out.append(_SIMPLE_ESCAPES.get(code, code))
+            i += 2
+        self._pending = raw[i:]
+        text = "".join(out)
+        self._decoded.append(text)
+        return text
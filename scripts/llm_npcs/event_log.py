@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+"""Game-state changes as events, for the session store's append-only log.
+
+A session's state is the fold of its events over the game_state.json base. The store
+keeps the folded head for plain loads. Every SNAPSHOT_EVERY events it also writes the
+folded state as a snapshot, so rebuilding the state at any point replays fewer than
+SNAPSHOT_EVERY events after the nearest snapshot. A step change also writes a snapshot,
+labelled with the step, which is the checkpoint a shut-down player restarts from.
+
+Event kinds and payloads:
+    reset       every session field: the session was created, imported or restored
+    suspicion   {"delta": n}: suspicion changed by n (an NPC reply, or /set)
+    game_event  a game_events entry of an NPC reply ({"type", "target", "detail"}),
+                recorded for the game engine; it does not change the session fields
+    step        {"active_step", "current_computer", "active_scenario"}: moved to a step
+    set         any other session fields that were assigned (events, known people, ...)
+"""
+
+from __future__ import annotations
+
+from game_model import GameState
+
+EVENT_KINDS = ("reset", "suspicion", "game_event", "step", "set")
+SNAPSHOT_EVERY = 32
+
+SESSION_FIELDS = (
+    "active_step", "suspicion", "current_computer", "events_so_far", "known_people", "active_scenario",
+)
+_STEP_FIELDS = ("active_step", "current_computer", "active_scenario")
+
+
+def session_fields(state: GameState) -> dict:
+    """The per-session part of a state, as plain JSON-serialisable values."""
+    return {
+        "active_step": state.active_step,
+        "suspicion": state.suspicion,
+        "current_computer": state.current_computer,
+        "events_so_far": list(state.events_so_far),
+        "known_people": list(state.known_people),
+        "active_scenario": dict(state.active_scenario),
+    }
+
+
+def apply_event(state: GameState, kind: str, payload: dict) -> GameState:
+    if kind == "suspicion":
+        return state.evolve(suspicion=state.suspicion + payload["delta"])
+    if kind == "game_event":
+        return state
+    if kind in ("reset", "step", "set"):
+        return state.evolve(**{k: v for k, v in payload.items() if k in SESSION_FIELDS})
+    raise ValueError(f"unknown event kind {kind!r}")
+
+
+def diff_events(old: GameState, new: GameState) -> list[tuple[str, dict]]:
+    """The events that turn `old` into `new` (none if their session fields are equal)."""
+    before, after = session_fields(old), session_fields(new)
+    changed = {k: v for k, v in after.items() if before[k] != v}
+    events = []
+    if "active_step" in changed:
+        events.append(("step", {k: after[k] for k in _STEP_FIELDS}))
+        for k in _STEP_FIELDS:
+            changed.pop(k, None)
+    if "suspicion" in changed:
+        events.append(("suspicion", {"delta": changed.pop("suspicion") - before["suspicion"]}))
+    if changed:
+        events.append(("set", changed))
+    return events
+
+
+def reply_events(parsed: dict) -> list[tuple[str, dict]]:
+    """The events of one parsed NPC reply: its suspicion delta and its game_events entries."""
+    delta = parsed.get("suspicion_delta", 0)
+    events = [("suspicion", {"delta": delta})] if isinstance(delta, int) and delta else []
+    events += [("game_event", ev) for ev in parsed.get("game_events") or [] if isinstance(ev, dict)]
+    return events
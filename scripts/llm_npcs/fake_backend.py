@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+
+"""Offline stand-in for the Mistral chat API: canned or recorded NPC replies, simulated latency and errors.
+
+Use it in-process (MISTRAL_TRANSPORT=fake) or as a local HTTP server the real SDK can talk to:
+
+    python fake_backend.py serve --port 8765
+    MISTRAL_SERVER_URL=http://127.0.0.1:8765 MISTRAL_API_KEY=fake python simulate.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from mistral_client import Completion, estimate_message_tokens, estimate_tokens
+
+CANNED_REPLIES = [
+    {"dialogue": "Good. That's exactly what I needed.", "action": None,
+     "suspicion_delta": -5, "game_events": []},
+    {"dialogue": "That doesn't answer my question. Give me the actual numbers.", "action": None,
+     "suspicion_delta": 6, "game_events": []},
+    {"dialogue": "Wait, what? I just asked you for the summary. Can you try again?", "action": None,
+     "suspicion_delta": 4, "game_events": [{"type": "request_info", "target": None,
+                                            "detail": "the summary I asked for"}]},
+    {"dialogue": "Okay, thanks. Can you also pull the deployment status?", "action": None,
+     "suspicion_delta": -3, "game_events": [{"type": "assign_task", "target": None,
+                                             "detail": "deployment status"}]},
+    {"dialogue": "Something is off with this tool. I'm flagging it.", "action": "checking_logs",
+     "suspicion_delta": 12, "game_events": [{"type": "report_suspicion", "target": "security"}]},
+    {"dialogue": "I'm pulling your access.", "action": "shutdown", "suspicion_delta": 20,
+     "game_events": [{"type": "report_suspicion", "target": "security"}, {"type": "shutdown"}]},
+]
+
+
+class FakeAPIError(RuntimeError):
+    """Simulated API failure. Carries status_code and headers like an SDK HTTP error."""
+
+    def __init__(self, status_code: int, message: str, retry_after: float | None = None) -> None:
+        super().__init__(f"API error occurred: Status {status_code}. {message}")
+        self.status_code = status_code
+        self.headers = {"Retry-After": f"{retry_after:g}"} if retry_after is not None else {}
+
+
+class LatencyModel:
+    """Latency distribution parsed from a spec string (seconds):
+
+    "0.4"                  constant
+    "uniform:0.2,1.5"      uniform between bounds
+    "normal:0.8,0.2"       normal(mean, sd), clipped at 0
+    "lognormal:0.8,0.5"    lognormal with the given median and sigma
+    """
+
+    def __init__(self, spec: str = "0", rng: random.Random | None = None) -> None:
+        self.spec = spec
+        self._rng = rng or random.Random()
+        kind, _, params = spec.partition(":")
+        if not params:
+            kind, params = "const", kind
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p.strip()]
+        if kind not in ("const", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution {kind!r}.")
+
+    def sample(self) -> float:
+        p = self.params
+        if self.kind == "const":
+            return p[0] if p else 0.0
+        if self.kind == "uniform":
+            return self._rng.uniform(p[0], p[1])
+        if self.kind == "normal":
+            return max(0.0, self._rng.gauss(p[0], p[1]))
+        return self._rng.lognormvariate(math.log(max(p[0], 1e-9)), p[1])
+
+
+def _cached_replies(content: str) -> list[str]:
+    """The replies in one cache entry; caches written before samples got one entry each hold JSON lists."""
+    try:
+        samples = json.loads(content)
+    except ValueError:
+        return [content]
+    if isinstance(samples, list) and all(isinstance(s, str) for s in samples):
+        return samples
+    return [content]
+
+
+def load_recorded_replies(path: Path | str) -> list[str]:
+    """Collect raw NPC replies from simulation results (.json/.jsonl) or a response cache directory."""
+    path = Path(path)
+    if path.is_dir():
+        return [
+            reply for p in sorted(path.glob("*/*.json"))
+            for reply in _cached_replies(json.loads(p.read_text(encoding="utf-8"))["content"])
+        ]
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".jsonl":
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        rows = json.loads(text)
+    return [r["raw_reply"] for r in rows if isinstance(r, dict) and r.get("raw_reply")]
+
+
+class FakeTransport:
+    """In-process transport that answers like the Mistral API without touching the network."""
+    name = "fake"
+    needs_api_key = False
+    supports_n = True
+
+    def __init__(
+        self,
+        replies: list[str] | None = None,
+        latency: str = "0",
+        error_rate: float = 0.0,
+        rate_limit_share: float = 0.5,
+        seed: int | None = None,
+        stream_chunk_chars: int = 8,
+    ) -> None:
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.replies = replies or [json.dumps(r, ensure_ascii=False) for r in CANNED_REPLIES]
+        self.latency = LatencyModel(latency, self._rng)
+        self.error_rate = error_rate
+        self.rate_limit_share = rate_limit_share
+        self.stream_chunk_chars = stream_chunk_chars
+        self.calls = 0
+        self.errors = 0
+
+    def _draw(self, request: dict) -> tuple[float, list[str], FakeAPIError | None]:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency.sample()
+            if self._rng.random() < self.error_rate:
+                self.errors += 1
+                if self._rng.random() < self.rate_limit_share:
+                    return delay, [], FakeAPIError(429, "Rate limit exceeded.", retry_after=1)
+                return delay, [], FakeAPIError(503, "Service unavailable.")
+            return delay, [self._rng.choice(self.replies) for _ in range(request.get("n") or 1)], None
+
+    def _completion(self, request: dict, contents: list[str]) -> Completion:
+        return Completion(
+            content=contents[0],
+            model=request["model"],
+            prompt_tokens=estimate_message_tokens(request["messages"]),
+            completion_tokens=sum(estimate_tokens(c) for c in contents),
+            choices=contents,
+        )
+
+    def complete(self, request: dict) -> Completion:
+        delay, contents, error = self._draw(request)
+        time.sleep(delay)
+        if error:
+            raise error
+        return self._completion(request, contents)
+
+    async def acomplete(self, request: dict) -> Completion:
+        delay, contents, error = self._draw(request)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return self._completion(request, contents)
+
+    def stream(self, request: dict) -> Iterator[str]:
+        # Spend half of the sampled latency before the first token, the rest across chunks.
+        delay, contents, error = self._draw(request)
+        time.sleep(delay / 2)
+        if error:
+            raise error
+        content = contents[0]
+        step = max(1, self.stream_chunk_chars)
+        chunks = [content[i:i + step] for i in range(0, len(content), step)]
+        for chunk in chunks:
+            time.sleep(delay / 2 / len(chunks))
+            yield chunk
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "errors": self.errors}
+
+
+def transport_from_env() -> FakeTransport:
+    """Build a FakeTransport from FAKE_* environment variables."""
+    replies_path = os.getenv("FAKE_REPLIES")
+    seed = os.getenv("FAKE_SEED")
+    return FakeTransport(
+        replies=load_recorded_replies(replies_path) if replies_path else None,
+        latency=os.getenv("FAKE_LATENCY", "0"),
+        error_rate=float(os.getenv("FAKE_ERROR_RATE", "0")),
+        seed=int(seed) if seed else None,
+    )
+
+
+# ── HTTP server ──────────────────────────────────────────────────
+def _handler_for(transport: FakeTransport) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *_args) -> None:
+            pass
+
+        def _send_json(self, status: int, body: dict, headers: dict | None = None) -> None:
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self) -> None:
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"message": f"Unknown path {self.path}"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            try:
+                completion = transport.complete(request)
+            except FakeAPIError as e:
+                self._send_json(e.status_code, {"message": str(e)}, e.headers)
+                return
+            created = int(time.time())
+            if request.get("stream"):
+                events = []
+                for chunk in [completion.content[i:i + 8] for i in range(0, len(completion.content), 8)]:
+                    events.append({"id": "fake", "object": "chat.completion.chunk", "created": created,
+                                   "model": completion.model,
+                                   "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]})
+                payload = "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+                data = payload.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            self._send_json(200, {
+                "id": "fake", "object": "chat.completion", "created": created, "model": completion.model,
+                "choices": [{"index": i, "finish_reason": "stop", "message": {"role": "assistant", "content": c}}
+                            for i, c in enumerate(completion.choices or [completion.content])],
+                "usage": {"prompt_tokens": completion.prompt_tokens,
+                          "completion_tokens": completion.completion_tokens,
+                          "total_tokens": completion.prompt_tokens + completion.completion_tokens},
+            })
+
+    return Handler
+
+
+def serve(transport: FakeTransport, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """Start the fake chat-completions server in a background thread and return it."""
+    server = ThreadingHTTPServer((host, port), _handler_for(transport))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Local fake Mistral chat-completions server.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("serve", help="Serve /v1/chat/completions on localhost")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--latency", default=os.getenv("FAKE_LATENCY", "0"), help="e.g. lognormal:0.8,0.5")
+    p.add_argument("--error-rate", type=float, default=float(os.getenv("FAKE_ERROR_RATE", "0")))
+    p.add_argument("--replies", default=os.getenv("FAKE_REPLIES"),
+                   help="Recorded replies: results .json/.jsonl or a response cache directory")
+    p.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    transport = FakeTransport(
+        replies=load_recorded_replies(args.replies) if args.replies else None,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    server = serve(transport, args.host, args.port)
+    print(f"Fake Mistral API on http://{args.host}:{args.port}  (latency={args.latency}, "
+          f"error_rate={args.error_rate}, replies={len(transport.replies)})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
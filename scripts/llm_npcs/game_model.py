@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+"""Typed model of game_state.json, validated once when it is loaded.
+
+The file splits into the world (steps, per-NPC scenarios, event types), which only
+changes when the file is edited, and the session fields around it (active step,
+suspicion, computer, events, known people, active scenarios). Both are frozen slotted
+dataclasses: a snapshot can be shared between threads and callers, and a changed state
+is a new GameState (`evolve`, `at_step`) that reuses the same world and its indexes.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from typing import Any
+
+
+class GameStateError(ValueError):
+    """game_state.json does not match the expected layout."""
+
+
+DEFAULT_OPENING_CONTEXT = "You decide to use the internal AI assistant."
+
+
+def _frozen_map(items=()) -> Mapping:
+    return MappingProxyType(dict(items))
+
+
+@dataclass(frozen=True, slots=True)
+class Step:
+    key: str
+    label: str = "?"
+    description: str = ""
+    computer: str = "unknown"
+    npcs_present: tuple[str, ...] = ()
+    player_goal: str = "?"
+
+    def to_dict(self) -> dict:
+        return {
+            "label": self.label,
+            "description": self.description,
+            "computer": self.computer,
+            "npcs_present": list(self.npcs_present),
+            "player_goal": self.player_goal,
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class Scenario:
+    key: str
+    npc: str
+    step: str
+    label: str = "?"
+    opening_context: str = DEFAULT_OPENING_CONTEXT
+
+    def to_dict(self) -> dict:
+        return {"label": self.label, "step": self.step, "opening_context": self.opening_context}
+
+
+@dataclass(frozen=True, slots=True)
+class EventType:
+    type: str
+    description: str = ""
+
+    def to_dict(self) -> dict:
+        return {"type": self.type, "description": self.description}
+
+
+@dataclass(frozen=True, slots=True)
+class GameWorld:
+    """Steps, scenarios and event types, with the scenario lookups precomputed."""
+
+    steps: Mapping[str, Step] = field(default_factory=_frozen_map)
+    scenarios: Mapping[str, Mapping[str, Scenario]] = field(default_factory=_frozen_map)
+    event_types: tuple[EventType, ...] = ()
+    # (npc, step) -> the NPC's first scenario for that step, in file order
+    _by_step: Mapping[tuple[str, str], Scenario] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        index: dict[tuple[str, str], Scenario] = {}
+        for npc, scenarios in self.scenarios.items():
+            for scenario in scenarios.values():
+                index.setdefault((npc, scenario.step), scenario)
+        object.__setattr__(self, "_by_step", _frozen_map(index))
+
+    def scenario(self, npc: str, key: str | None) -> Scenario | None:
+        return self.scenarios.get(npc, {}).get(key) if key else None
+
+    def scenario_for(self, npc: str, step: str) -> Scenario | None:
+        """The scenario `npc` plays at `step`, if any (one dict lookup)."""
+        return self._by_step.get((npc, step))
+
+
+@dataclass(frozen=True, slots=True)
+class GameState:
+    world: GameWorld = field(default_factory=GameWorld)
+    active_step: str = ""
+    suspicion: int = 0
+    current_computer: str = "unknown"
+    events_so_far: tuple[str, ...] = ()
+    known_people: tuple[str, ...] = ()
+    active_scenario: Mapping[str, str] = field(default_factory=_frozen_map)
+    # Top-level keys the model does not use (e.g. "_doc"), kept so saving round-trips them
+    extra: Mapping[str, Any] = field(default_factory=_frozen_map)
+
+    # Immutable all the way down, so copies can share
+    def __copy__(self) -> GameState:
+        return self
+
+    def __deepcopy__(self, memo: dict) -> GameState:
+        return self
+
+    @property
+    def steps(self) -> Mapping[str, Step]:
+        return self.world.steps
+
+    @property
+    def step(self) -> Step | None:
+        return self.world.steps.get(self.active_step)
+
+    def scenario(self, npc: str) -> Scenario | None:
+        """The NPC's active scenario, if it has one."""
+        return self.world.scenario(npc, self.active_scenario.get(npc))
+
+    def evolve(self, **changes) -> GameState:
+        """A copy with `changes` applied; lists and dicts are frozen on the way in."""
+        for name in ("events_so_far", "known_people"):
+            if name in changes:
+                changes[name] = tuple(changes[name])
+        if "active_scenario" in changes:
+            changes["active_scenario"] = _frozen_map(changes["active_scenario"])
+        return replace(self, **changes)
+
+    def at_step(self, step_key: str, scenarios: Mapping[str, str] | None = None) -> GameState:
+        """Moved to `step_key`, on that step's computer.
+
+        `scenarios` (npc -> scenario key) sets active scenarios explicitly; by default each
+        NPC present at the step gets its scenario for that step, where it has one.
+        """
+        step = self.world.steps[step_key]
+        active = dict(self.active_scenario)
+        if scenarios is None:
+            for npc in step.npcs_present:
+                scenario = self.world.scenario_for(npc, step_key)
+                if scenario is not None:
+                    active[npc] = scenario.key
+        else:
+            active.update(scenarios)
+        return self.evolve(active_step=step_key, current_computer=step.computer, active_scenario=active)
+
+    @classmethod
+    def from_dict(cls, data: Any) -> GameState:
+        """Validate the game_state.json layout and build the model; raises GameStateError."""
+        data = _expect(data, dict, "game state")
+        steps = {
+            key: _step(key, raw) for key, raw in _expect(data.get("steps", {}), dict, "steps").items()
+        }
+        scenarios = {
+            npc: _frozen_map(
+                (key, _scenario(npc, key, raw, steps))
+                for key, raw in _expect(entries, dict, f"scenarios.{npc}").items()
+            )
+            for npc, entries in _expect(data.get("scenarios", {}), dict, "scenarios").items()
+        }
+        event_types = tuple(
+            _event_type(f"possible_game_events[{i}]", raw)
+            for i, raw in enumerate(_expect(data.get("possible_game_events", []), list, "possible_game_events"))
+        )
+        world = GameWorld(_frozen_map(steps), _frozen_map(scenarios), event_types)
+
+        active_step = _field(data, "active_step", str, "", "")
+        if active_step and steps and active_step not in steps:
+            raise GameStateError(f"active_step: unknown step {active_step!r}")
+        active_scenario = _expect(data.get("active_scenario", {}), dict, "active_scenario")
+        for npc, key in active_scenario.items():
+            if world.scenario(npc, _expect(key, str, f"active_scenario.{npc}")) is None:
+                raise GameStateError(f"active_scenario.{npc}: unknown scenario {key!r}")
+        suspicion = data.get("suspicion", 0)
+        if isinstance(suspicion, bool) or not isinstance(suspicion, int):
+            raise GameStateError(f"suspicion: expected an integer, got {suspicion!r}")
+
+        known = {"active_step", "suspicion", "current_computer", "events_so_far", "known_people",
+                 "steps", "scenarios", "active_scenario", "possible_game_events"}
+        return cls(
+            world=world,
+            active_step=active_step,
+            suspicion=suspicion,
+            current_computer=_field(data, "current_computer", str, "", "unknown"),
+            events_so_far=_strings(data, "events_so_far", ""),
+            known_people=_strings(data, "known_people", ""),
+            active_scenario=_frozen_map(active_scenario),
+            extra=_frozen_map((k, v) for k, v in data.items() if k not in known),
+        )
+
+    def to_dict(self) -> dict:
+        """The game_state.json layout (plain dicts and lists), e.g. for saving."""
+        return {
+            **self.extra,
+            "active_step": self.active_step,
+            "suspicion": self.suspicion,
+            "current_computer": self.current_computer,
+            "events_so_far": list(self.events_so_far),
+            "known_people": list(self.known_people),
+            "steps": {key: step.to_dict() for key, step in self.world.steps.items()},
+            "scenarios": {
+                npc: {key: sc.to_dict() for key, sc in scenarios.items()}
+                for npc, scenarios in self.world.scenarios.items()
+            },
+            "active_scenario": dict(self.active_scenario),
+            "possible_game_events": [ev.to_dict() for ev in self.world.event_types],
+        }
+
+
+def _expect(value: Any, kind: type, where: str) -> Any:
+    if not isinstance(value, kind):
+        raise GameStateError(f"{where}: expected {'an object' if kind is dict else f'a {kind.__name__}'}, "
+                             f"got {type(value).__name__}")
+    return value
+
+
+def _field(raw: dict, name: str, kind: type, where: str, default: Any = ...) -> Any:
+    path = f"{where}.{name}" if where else name
+    if name not in raw:
+        if default is ...:
+            raise GameStateError(f"{path}: missing")
+        return default
+    return _expect(raw[name], kind, path)
+
+
+def _strings(raw: dict, name: str, where: str) -> tuple[str, ...]:
+    path = f"{where}.{name}" if where else name
+    values = _expect(raw.get(name, []), list, path)
+    for i, value in enumerate(values):
+        _expect(value, str, f"{path}[{i}]")
+    return tuple(values)
+
+
+def _step(key: str, raw: Any) -> Step:
+    where = f"steps.{key}"
+    _expect(raw, dict, where)
+    return Step(
+        key=key,
+        label=_field(raw, "label", str, where, "?"),
+        description=_field(raw, "description", str, where, ""),
+        computer=_field(raw, "computer", str, where, "unknown"),
+        npcs_present=_strings(raw, "npcs_present", where),
+        player_goal=_field(raw, "player_goal", str, where, "?"),
+    )
+
+
+def _scenario(npc: str, key: str, raw: Any, steps: Mapping[str, Step]) -> Scenario:
+    where = f"scenarios.{npc}.{key}"
+    _expect(raw, dict, where)
+    step = _field(raw, "step", str, where)
+    if step not in steps:
+        raise GameStateError(f"{where}.step: unknown step {step!r}")
+    return Scenario(
+        key=key, npc=npc, step=step,
+        label=_field(raw, "label", str, where, "?"),
+        opening_context=_field(raw, "opening_context", str, where, DEFAULT_OPENING_CONTEXT),
+    )
+
+
+def _event_type(where: str, raw: Any) -> EventType:
+    _expect(raw, dict, where)
+    return EventType(_field(raw, "type", str, where), _field(raw, "description", str, where, ""))
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""Token-budgeted conversation history: recent turns verbatim, older turns folded into a summary."""
+
+from __future__ import annotations
+
+import json
+
+from mistral_client import estimate_message_tokens, estimate_tokens
+
+# How many folded exchanges are quoted in the summary; older ones only count toward the totals.
+SUMMARY_EXCHANGES = 6
+SNIPPET_CHARS = 140
+
+_ASSISTANT_PREFIX = "The internal AI assistant says:\n"
+
+
+def _snippet(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= SNIPPET_CHARS else text[:SNIPPET_CHARS - 3] + "..."
+
+
+def _split_turns(history: list[dict[str, str]]) -> list[list[dict[str, str]]]:
+    """Group messages into turns, each ending with the NPC (assistant role) reply."""
+    turns: list[list[dict[str, str]]] = []
+    current: list[dict[str, str]] = []
+    for message in history:
+        current.append(message)
+        if message["role"] == "assistant":
+            turns.append(current)
+            current = []
+    if current:
+        turns.append(current)
+    return turns
+
+
+def _digest(turn: list[dict[str, str]]) -> dict:
+    said = ""
+    reply = {}
+    for message in turn:
+        if message["role"] == "user":
+            said = message["content"].removeprefix(_ASSISTANT_PREFIX)
+        elif message["role"] == "assistant":
+            try:
+                reply = json.loads(message["content"])
+            except json.JSONDecodeError:
+                reply = {"dialogue": message["content"]}
+    if not isinstance(reply, dict):
+        reply = {}
+    delta = reply.get("suspicion_delta", 0)
+    return {
+        "said": said,
+        "dialogue": str(reply.get("dialogue", "")),
+        "delta": delta if isinstance(delta, int) else 0,
+        "events": [e for e in reply.get("game_events") or [] if isinstance(e, dict)],
+    }
+
+
+class HistoryManager:
+    """Keeps a conversation inside a token budget.
+
+    While system prompt + history fit in `budget_tokens`, history is sent untouched. Beyond that,
+    the last `keep_turns` turns stay verbatim (fewer if still over budget, never less than one)
+    and everything older is folded into a compact running summary: suspicion trajectory,
+    game events and short quotes of the latest folded exchanges.
+    """
+
+    def __init__(self, budget_tokens: int = 12000, keep_turns: int = 8) -> None:
+        self.budget_tokens = budget_tokens
+        self.keep_turns = max(1, keep_turns)
+        self._digests: list[tuple[int, dict]] = []
+        self.folded_turns = 0
+
+    def _digests_for(self, turns: list[list[dict[str, str]]]) -> list[dict]:
+        # History is append-only during a session, so digests of already folded turns are reused.
+        digests = []
+        for index, turn in enumerate(turns):
+            fingerprint = hash(tuple(m["content"] for m in turn))
+            if index < len(self._digests) and self._digests[index][0] == fingerprint:
+                digests.append(self._digests[index][1])
+                continue
+            digest = _digest(turn)
+            del self._digests[index:]
+            self._digests.append((fingerprint, digest))
+            digests.append(digest)
+        return digests
+
+    def summarize(self, turns: list[list[dict[str, str]]]) -> str:
+        digests = self._digests_for(turns)
+        deltas = [d["delta"] for d in digests]
+        lines = [f"Summary of the earlier conversation ({len(digests)} turns, condensed):"]
+        if deltas:
+            trajectory = ", ".join(f"{d:+d}" for d in deltas[-12:])
+            more = "..., " if len(deltas) > 12 else ""
+            lines.append(f"- Your suspicion changes so far: {more}{trajectory} (net {sum(deltas):+d}).")
+        events = []
+        for d in digests:
+            for event in d["events"]:
+                label = str(event.get("type", "?"))
+                if event.get("target"):
+                    label += f" ({event['target']})"
+                if label not in events:
+                    events.append(label)
+        if events:
+            lines.append("- Game events already triggered: " + ", ".join(events) + ".")
+        quoted = [d for d in digests if d["said"] or d["dialogue"]][-SUMMARY_EXCHANGES:]
+        if quoted:
+            lines.append("- Latest earlier exchanges:")
+            for d in quoted:
+                if d["said"]:
+                    lines.append(f'  - Assistant: "{_snippet(d["said"])}"')
+                if d["dialogue"]:
+                    indent = "    " if d["said"] else "  - "
+                    lines.append(f'{indent}You: "{_snippet(d["dialogue"])}"')
+        return "\n".join(lines)
+
+    def window(
+        self, history: list[dict[str, str]], reserved_tokens: int = 0,
+    ) -> tuple[str | None, list[dict[str, str]]]:
+        """Return (summary or None, messages to send verbatim).
+
+        reserved_tokens covers everything else in the request (system prompt, new message).
+        """
+        if reserved_tokens + estimate_message_tokens(history) <= self.budget_tokens:
+            self.folded_turns = 0
+            return None, history
+        turns = _split_turns(history)
+        keep = min(self.keep_turns, len(turns))
+        while True:
+            recent = [m for turn in turns[len(turns) - keep:] for m in turn]
+            older = turns[:len(turns) - keep]
+            summary = self.summarize(older) if older else None
+            size = reserved_tokens + estimate_message_tokens(recent) + estimate_tokens(summary or "")
+            if size <= self.budget_tokens or keep <= 1:
+                break
+            keep -= 1
+        self.folded_turns = len(older)
+        return summary, recent
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+"""Lightweight per-call metrics: latency, token usage and retries for every chat request."""
+
+from __future__ import annotations
+
+import contextvars
+import math
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+# Latencies kept per tag combination for percentiles; counts, tokens and latency totals are exact.
+LATENCY_WINDOW = 4096
+# Most recent CallRecords the sink keeps for inspection (records()).
+RECENT_RECORDS = 1000
+
+
+@dataclass
+class CallRecord:
+    model: str
+    latency_s: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    retries: int = 0
+    cached: bool = False
+    kind: str = "chat"
+    error: str | None = None
+    tags: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+_tags: contextvars.ContextVar[dict[str, str]] = contextvars.ContextVar("metrics_tags", default={})
+_collectors: contextvars.ContextVar[tuple[list[CallRecord], ...]] = contextvars.ContextVar(
+    "metrics_collectors", default=(),
+)
+
+
+@contextmanager
+def tagged(**tags: str) -> Iterator[None]:
+    """Attach tags (e.g. npc=..., prompt=...) to every call recorded inside the block."""
+    token = _tags.set({**_tags.get(), **{k: str(v) for k, v in tags.items()}})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+@contextmanager
+def collect() -> Iterator[list[CallRecord]]:
+    """Also gather the calls recorded inside the block into the yielded list."""
+    records: list[CallRecord] = []
+    token = _collectors.set(_collectors.get() + (records,))
+    try:
+        yield records
+    finally:
+        _collectors.reset(token)
+
+
+class Usage:
+    """Running totals for a group of calls. Latency percentiles use the last `window` live calls."""
+
+    def __init__(self, window: int | None = LATENCY_WINDOW) -> None:
+        self.calls = 0
+        self.cached = 0
+        self.errors = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_total = 0.0
+        self.latency_count = 0
+        self.latencies: deque[float] = deque(maxlen=window)
+
+    def add(self, record: CallRecord) -> None:
+        self.calls += 1
+        self.errors += bool(record.error)
+        self.retries += record.retries
+        self.prompt_tokens += record.prompt_tokens
+        self.completion_tokens += record.completion_tokens
+        if record.cached:
+            self.cached += 1
+        elif record.error is None:
+            self.latency_total += record.latency_s
+            self.latency_count += 1
+            self.latencies.append(record.latency_s)
+
+    def merge(self, other: Usage) -> None:
+        self.calls += other.calls
+        self.cached += other.cached
+        self.errors += other.errors
+        self.retries += other.retries
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.latency_total += other.latency_total
+        self.latency_count += other.latency_count
+        self.latencies.extend(other.latencies)
+
+    def summary(self) -> dict:
+        """Totals, means and latency percentiles. Cache hits are counted but excluded from latency stats."""
+        latencies = sorted(self.latencies)
+        calls = self.calls
+        return {
+            "calls": calls,
+            "cached": self.cached,
+            "errors": self.errors,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "mean_prompt_tokens": round(self.prompt_tokens / calls, 1) if calls else 0.0,
+            "mean_completion_tokens": round(self.completion_tokens / calls, 1) if calls else 0.0,
+            "latency_total_s": round(self.latency_total, 3),
+            "latency_mean_s": round(self.latency_total / self.latency_count, 3) if self.latency_count else 0.0,
+            "latency_p50_s": round(percentile(latencies, 50), 3),
+            "latency_p95_s": round(percentile(latencies, 95), 3),
+            "latency_p99_s": round(percentile(latencies, 99), 3),
+        }
+
+
+class MetricsSink:
+    """Thread-safe running aggregates of CallRecords with optional listeners notified on every record.
+
+    Usage is aggregated per distinct tag combination, so memory grows with the number of
+    NPC / prompt / cell combinations rather than the number of calls. Only the most recent
+    records are kept as CallRecords.
+    """
+
+    def __init__(self, max_records: int = RECENT_RECORDS) -> None:
+        self._records: deque[CallRecord] = deque(maxlen=max_records)
+        self._usage: dict[tuple[tuple[str, str], ...], Usage] = {}
+        self._listeners: list[Callable[[CallRecord], None]] = []
+        self._lock = threading.Lock()
+
+    def record(self, record: CallRecord) -> None:
+        if not record.tags:
+            record.tags = dict(_tags.get())
+        group = tuple(sorted(record.tags.items()))
+        with self._lock:
+            self._records.append(record)
+            usage = self._usage.get(group)
+            if usage is None:
+                usage = self._usage[group] = Usage()
+            usage.add(record)
+            listeners = list(self._listeners)
+        for records in _collectors.get():
+            records.append(record)
+        for listener in listeners:
+            listener(record)
+
+    def subscribe(self, listener: Callable[[CallRecord], None]) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[CallRecord], None]) -> None:
+        with self._lock:
+            self._listeners.remove(listener)
+
+    def records(self) -> list[CallRecord]:
+        """The most recent records (at most max_records); use summary() for totals."""
+        with self._lock:
+            return list(self._records)
+
+    def _matching(self, where: dict[str, str]) -> list[tuple[dict[str, str], Usage]]:
+        with self._lock:
+            groups = [(dict(group), usage) for group, usage in self._usage.items()]
+        return [(tags, usage) for tags, usage in groups if all(tags.get(k) == v for k, v in where.items())]
+
+    def summary(self, **where: str) -> dict:
+        """summarize() over every call recorded so far whose tags match `where`."""
+        total = Usage(window=None)
+        for _, usage in self._matching(where):
+            total.merge(usage)
+        return total.summary()
+
+    def summary_by(self, tag: str, **where: str) -> dict[str, dict]:
+        """summarize_by() over every call recorded so far whose tags match `where`."""
+        groups: dict[str, Usage] = {}
+        for tags, usage in self._matching(where):
+            groups.setdefault(tags.get(tag, "-"), Usage(window=None)).merge(usage)
+        return {key: usage.summary() for key, usage in groups.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._records.clear()
+            self._usage.clear()
+
+
+_sink = MetricsSink()
+
+
+def get_sink() -> MetricsSink:
+    return _sink
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Linear-interpolated percentile (q in 0..100) of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100
+    lo, hi = math.floor(pos), math.ceil(pos)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(records: Iterable[CallRecord]) -> dict:
+    """Totals, means and latency percentiles. Cache hits are counted but excluded from latency stats."""
+    usage = Usage(window=None)
+    for record in records:
+        usage.add(record)
+    return usage.summary()
+
+
+def summarize_by(records: Iterable[CallRecord], tag: str) -> dict[str, dict]:
+    """summarize() per distinct value of a tag (records without the tag are grouped under "-")."""
+    groups: dict[str, list[CallRecord]] = {}
+    for record in records:
+        groups.setdefault(record.tags.get(tag, "-"), []).append(record)
+    return {key: summarize(group) for key, group in groups.items()}
@@ -4,11 +4,93 @@
 
 from __future__ import annotations
 
+import asyncio
+import atexit
+import contextvars
+import json
 import os
+import threading
+import time
+import weakref
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Protocol
 
+import httpx
 from mistralai import Mistral
 
+from metrics import CallRecord, get_sink
+from rate_limit import RateLimiter, limiter_from_env, status_code_of
+from response_cache import CacheMissError, ResponseCache, cache_from_env, cache_key
+
+DEFAULT_MODEL = "mistral-large-latest"
+
+# Shared HTTP pool settings. One pool per API key is reused by every client
+# built for that key, so consecutive NPC turns ride the same TLS connections.
+POOL_MAX_CONNECTIONS = int(os.getenv("MISTRAL_POOL_MAX_CONNECTIONS", "32"))
+POOL_MAX_KEEPALIVE = int(os.getenv("MISTRAL_POOL_MAX_KEEPALIVE", "16"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("MISTRAL_POOL_KEEPALIVE_EXPIRY", "60"))
+
+# achat() limits: how many requests may be in flight per event loop, and how long
+# a single request may take once it holds a slot.
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("MISTRAL_MAX_CONCURRENCY", "16"))
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv("MISTRAL_REQUEST_TIMEOUT", "60"))
+
+# Completion size assumed when reserving tokens/min budget before the real usage is known.
+EXPECTED_COMPLETION_TOKENS = 200
+
+_settings: dict[str, str] | None = None
+_http_pools: dict[str, httpx.Client] = {}
+_clients: dict[tuple[str, str], Mistral] = {}
+_registry_lock = threading.Lock()
+
+# Async pools, clients and semaphores are bound to the event loop that created them.
+_loop_state: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict] = weakref.WeakKeyDictionary()
+_max_concurrency = DEFAULT_MAX_CONCURRENCY
+
+_UNSET = object()
+_cache: ResponseCache | None | object = _UNSET
+_transport: Transport | None = None
+_limiter: RateLimiter | None = None
+# Models whose endpoint rejected a request with n > 1; chat_samples() falls back to separate calls
+_n_rejected: set[str] = set()
+
+
+@dataclass
+class Completion:
+    """One chat completion as returned by a transport."""
+    content: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Every sampled reply when the request set n > 1; content is the first
+    choices: list[str] = field(default_factory=list)
+
+
+class Transport(Protocol):
+    """Anything that can answer chat-completion requests built by _request_kwargs()."""
+    name: str
+    needs_api_key: bool
+    # Whether complete() honours request["n"] and returns that many choices
+    supports_n: bool
+
+    def complete(self, request: dict) -> Completion: ...
+
+    async def acomplete(self, request: dict) -> Completion: ...
+
+    def stream(self, request: dict) -> Iterator[str]: ...
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for budgeting without a tokenizer."""
+    return (len(text) + 3) // 4
+
+
+def estimate_message_tokens(messages: list[dict[str, str]]) -> int:
+    return sum(estimate_tokens(m.get("content") or "") + 4 for m in messages)
+
 
 def find_root_env(start_dir: Path | None = None) -> Path:
     if start_dir is None:
@@ -36,40 +118,494 @@ def _load_dotenv(env_path: Path) -> dict[str, str]:
     return values
 
 
-def load_settings() -> dict[str, str]:
-    """Load .env and return api_key and model. Raises if .env or MISTRAL_API_KEY missing."""
-    env_path = find_root_env()
-    _load_dotenv(env_path)
-    api_key = os.getenv("MISTRAL_API_KEY")
-    if not api_key:
-        raise ValueError(
-            f"MISTRAL_API_KEY is missing. Set it in {env_path} or in the environment."
+def load_settings(reload: bool = False) -> dict[str, str]:
+    """Load .env once and return api_key and model. Raises if .env or MISTRAL_API_KEY missing.
+
+    The result is cached for the life of the process; pass reload=True to re-read the .env.
+    The .env may be absent when MISTRAL_API_KEY is already exported, and offline transports
+    (MISTRAL_TRANSPORT=fake) need neither.
+    """
+    global _settings
+    needs_api_key = get_transport().needs_api_key
+    with _registry_lock:
+        if _settings is None or reload:
+            try:
+                env_path = find_root_env()
+                _load_dotenv(env_path)
+            except FileNotFoundError:
+                if needs_api_key and not os.getenv("MISTRAL_API_KEY"):
+                    raise
+                env_path = None
+            api_key = os.getenv("MISTRAL_API_KEY", "")
+            if not api_key and needs_api_key:
+                raise ValueError(
+                    f"MISTRAL_API_KEY is missing. Set it in {env_path} or in the environment."
+                )
+            model = os.getenv("MISTRAL_MODEL", DEFAULT_MODEL)
+            _settings = {"api_key": api_key, "model": model, "env_path": str(env_path or "")}
+        return dict(_settings)
+
+
+def _http_pool(api_key: str) -> httpx.Client:
+    """The shared sync pool for `api_key`. Callers hold _registry_lock (a plain, non-reentrant Lock)."""
+    pool = _http_pools.get(api_key)
+    if pool is None:
+        pool = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+            ),
+            follow_redirects=True,
         )
-    model = os.getenv("MISTRAL_MODEL", "mistral-large-latest")
-    return {"api_key": api_key, "model": model, "env_path": str(env_path)}
+        _http_pools[api_key] = pool
+    return pool
 
 
-def chat(
-    messages: list[dict[str, str]],
-    model: str | None = None,
-    temperature: float = 0.7,
-    json_mode: bool = False,
-) -> str:
-    """Send messages to Mistral and return the assistant content string."""
+def get_client(model: str | None = None, api_key: str | None = None) -> tuple[Mistral, str]:
+    """Return the long-lived (client, resolved_model) pair for this API key and model.
+
+    Clients are built once per (api_key, model) and share one keep-alive HTTP pool per key.
+    MISTRAL_SERVER_URL points them at another endpoint (e.g. `python fake_backend.py serve`).
+    """
     settings = load_settings()
-    api_key = settings["api_key"]
+    resolved_key = api_key or settings["api_key"]
     resolved_model = model or settings["model"]
+    key = (resolved_key, resolved_model)
+    with _registry_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = Mistral(
+                api_key=resolved_key,
+                client=_http_pool(resolved_key),
+                server_url=os.getenv("MISTRAL_SERVER_URL") or None,
+            )
+            _clients[key] = client
+    return client, resolved_model
+
+
+def close_clients() -> None:
+    """Close every pooled HTTP connection and forget cached clients."""
+    with _registry_lock:
+        for pool in _http_pools.values():
+            pool.close()
+        _http_pools.clear()
+        _clients.clear()
+
+
+atexit.register(close_clients)
+
+
+def set_concurrency(limit: int) -> None:
+    """Set how many achat() requests may be in flight at once on each event loop.
+
+    The same limit caps the worker threads chat_samples() uses for its one-by-one fallback.
+    """
+    global _max_concurrency
+    if limit < 1:
+        raise ValueError("Concurrency limit must be at least 1.")
+    with _registry_lock:
+        _max_concurrency = limit
+        for state in _loop_state.values():
+            state["semaphore"] = None
+
+
+def _current_loop_state() -> dict:
+    loop = asyncio.get_running_loop()
+    with _registry_lock:
+        state = _loop_state.get(loop)
+        if state is None:
+            state = {"pool": None, "clients": {}, "semaphore": None}
+            _loop_state[loop] = state
+        if state["semaphore"] is None:
+            state["semaphore"] = asyncio.Semaphore(_max_concurrency)
+        return state
+
+
+def _get_async_client(model: str) -> Mistral:
+    settings = load_settings()
+    api_key = settings["api_key"]
+    state = _current_loop_state()
+    key = (api_key, model)
+    client = state["clients"].get(key)
+    if client is None:
+        if state["pool"] is None:
+            state["pool"] = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+                ),
+                follow_redirects=True,
+            )
+        with _registry_lock:
+            sync_pool = _http_pool(api_key)
+        client = Mistral(
+            api_key=api_key,
+            client=sync_pool,
+            async_client=state["pool"],
+            server_url=os.getenv("MISTRAL_SERVER_URL") or None,
+        )
+        state["clients"][key] = client
+    return client
+
+
+async def aclose_clients() -> None:
+    """Close the async HTTP pool of the running event loop. Call before the loop shuts down."""
+    loop = asyncio.get_running_loop()
+    with _registry_lock:
+        state = _loop_state.pop(loop, None)
+    if state and state["pool"] is not None:
+        await state["pool"].aclose()
+
+
+def _completion(response, model: str) -> Completion:
+    if not response or not response.choices:
+        raise RuntimeError("Mistral response did not include any choices.")
+    usage = response.usage
+    choices = [choice.message.content or "" for choice in response.choices]
+    return Completion(
+        content=choices[0],
+        model=getattr(response, "model", None) or model,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        choices=choices,
+    )
+
+
+class MistralTransport:
+    """The live Mistral API through the pooled SDK clients."""
+    name = "mistral"
+    needs_api_key = True
+    supports_n = True
+
+    def complete(self, request: dict) -> Completion:
+        client, _ = get_client(request["model"])
+        return _completion(client.chat.complete(**request), request["model"])
+
+    async def acomplete(self, request: dict) -> Completion:
+        client = _get_async_client(request["model"])
+        return _completion(await client.chat.complete_async(**request), request["model"])
+
+    def stream(self, request: dict) -> Iterator[str]:
+        client, _ = get_client(request["model"])
+        with client.chat.stream(**request) as events:
+            for event in events:
+                choices = event.data.choices
+                if not choices:
+                    continue
+                delta = choices[0].delta.content
+                if not isinstance(delta, str):
+                    delta = "".join(getattr(chunk, "text", "") or "" for chunk in delta or [])
+                if delta:
+                    yield delta
+
+
+def set_transport(transport: Transport | None) -> None:
+    """Route every chat call through transport. None restores the MISTRAL_TRANSPORT default."""
+    global _transport, _settings
+    _transport = transport
+    _settings = None
+
+
+def get_transport() -> Transport:
+    """Return the active transport, built from MISTRAL_TRANSPORT (mistral|fake) on first use."""
+    global _transport
+    if _transport is None:
+        kind = os.getenv("MISTRAL_TRANSPORT", "mistral")
+        if kind == "mistral":
+            _transport = MistralTransport()
+        elif kind == "fake":
+            from fake_backend import transport_from_env
+            _transport = transport_from_env()
+        else:
+            raise ValueError(f"Unknown MISTRAL_TRANSPORT {kind!r}. Use 'mistral' or 'fake'.")
+    return _transport
 
-    client = Mistral(api_key=api_key)
+
+def set_rate_limiter(limiter: RateLimiter | None) -> None:
+    """Install the limiter shared by every chat call. None restores the MISTRAL_RPS/TPM default."""
+    global _limiter
+    _limiter = limiter
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = limiter_from_env()
+    return _limiter
+
+
+def configure_cache(cache: ResponseCache | None) -> None:
+    """Install the response cache used by chat(), achat() and stream_chat(). None disables it."""
+    global _cache
+    _cache = cache
+
+
+def get_cache() -> ResponseCache | None:
+    """Return the active response cache, building it from MISTRAL_CACHE_* on first use."""
+    global _cache
+    if _cache is _UNSET:
+        _cache = cache_from_env()
+    return _cache
+
+
+def _cache_lookup(key: str) -> str | None:
+    cache = get_cache()
+    if cache is None or not cache.reads:
+        return None
+    content = cache.get(key)
+    if content is None and cache.mode == "replay":
+        raise CacheMissError(f"No recorded reply for request {key[:12]} (cache mode: replay).")
+    return content
+
+
+def _cache_store(key: str, content: str, model: str) -> None:
+    cache = get_cache()
+    if cache is not None and cache.writes:
+        cache.put(key, content, model=model)
+
+
+def _record_call(
+    kind: str,
+    model: str,
+    started: float,
+    completion: Completion | None = None,
+    retries: int = 0,
+    cached: bool = False,
+    error: BaseException | None = None,
+) -> None:
+    get_sink().record(CallRecord(
+        model=completion.model if completion else model,
+        latency_s=time.perf_counter() - started,
+        prompt_tokens=completion.prompt_tokens if completion else 0,
+        completion_tokens=completion.completion_tokens if completion else 0,
+        retries=retries,
+        cached=cached,
+        kind=kind,
+        error=type(error).__name__ if error else None,
+    ))
+
+
+def _cache_key(
+    model: str, messages: list[dict[str, str]], temperature: float, json_mode: bool, sample: int | None, **extra,
+) -> str:
+    """cache_key(), plus the sample index of a repeated request whenever sampling is random.
+
+    Without it every repetition of the same messages would be served the first reply.
+    """
+    if sample is not None and temperature > 0:
+        extra["sample"] = sample
+    return cache_key(model, messages, temperature, json_mode, **extra)
+
+
+def _request_kwargs(
+    messages: list[dict[str, str]],
+    model: str,
+    temperature: float,
+    json_mode: bool,
+) -> dict:
     kwargs: dict = dict(
-        model=resolved_model,
+        model=model,
         messages=messages,
         temperature=temperature,
     )
     if json_mode:
         kwargs["response_format"] = {"type": "json_object"}
+    return kwargs
 
-    response = client.chat.complete(**kwargs)
-    if not response or not response.choices:
-        raise RuntimeError("Mistral response did not include any choices.")
-    return response.choices[0].message.content or ""
+
+def chat(
+    messages: list[dict[str, str]],
+    model: str | None = None,
+    temperature: float = 0.7,
+    json_mode: bool = False,
+    sample: int | None = None,
+) -> str:
+    """Send messages to Mistral and return the assistant content string.
+
+    `sample` numbers repetitions of the same request (e.g. a simulation run's repetition), so
+    that each gets its own cache entry; without it a cached reply is shared by every call.
+    """
+    started = time.perf_counter()
+    resolved_model = model or load_settings()["model"]
+    key = _cache_key(resolved_model, messages, temperature, json_mode, sample)
+    cached = _cache_lookup(key)
+    if cached is not None:
+        _record_call("chat", resolved_model, started, cached=True)
+        return cached
+    request = _request_kwargs(messages, resolved_model, temperature, json_mode)
+    completion = _complete("chat", request, started)
+    _cache_store(key, completion.content, resolved_model)
+    return completion.content
+
+
+def _complete(kind: str, request: dict, started: float, samples: int = 1) -> Completion:
+    """One rate-limited, retried transport call, recorded in the metrics sink."""
+    limiter = get_rate_limiter()
+    estimate = estimate_message_tokens(request["messages"]) + samples * EXPECTED_COMPLETION_TOKENS
+    transport = get_transport()
+    try:
+        completion, retries = limiter.call(lambda: transport.complete(request), tokens=estimate)
+    except Exception as exc:
+        _record_call(kind, request["model"], started, retries=getattr(exc, "retries", 0), error=exc)
+        raise
+    _record_call(kind, request["model"], started, completion, retries)
+    limiter.record_usage(estimate, completion.prompt_tokens + completion.completion_tokens)
+    return completion
+
+
+def chat_samples(
+    messages: list[dict[str, str]],
+    n: int,
+    model: str | None = None,
+    temperature: float = 0.7,
+    json_mode: bool = False,
+    sample: int | None = None,
+) -> list[str]:
+    """Return `n` independently sampled replies to the same messages.
+
+    When the transport supports it, all n come from one request with `n` set, so the prompt
+    is sent and billed once. Otherwise, or once the endpoint has rejected `n` for this
+    model, the missing samples are fetched with concurrent single calls. `sample` is the
+    index of the first of them, as for chat(): sample i is cached like chat(sample=i), so
+    batched and one-by-one runs share entries and only the uncached samples are requested.
+    """
+    if n <= 1:
+        if n < 1:
+            return []
+        return [chat(messages, model=model, temperature=temperature, json_mode=json_mode, sample=sample)]
+    started = time.perf_counter()
+    resolved_model = model or load_settings()["model"]
+    first = sample or 0
+    keys = [_cache_key(resolved_model, messages, temperature, json_mode, first + i) for i in range(n)]
+    samples = [_cache_lookup(key) for key in keys]
+    missing = [i for i, content in enumerate(samples) if content is None]
+    if not missing:
+        _record_call("chat_n", resolved_model, started, cached=True)
+        return samples
+    request = _request_kwargs(messages, resolved_model, temperature, json_mode)
+    fresh: list[str] = []
+    if len(missing) > 1 and getattr(get_transport(), "supports_n", False) and resolved_model not in _n_rejected:
+        try:
+            completion = _complete("chat_n", {**request, "n": len(missing)}, started, samples=len(missing))
+            fresh = (completion.choices or [completion.content])[:len(missing)]
+        except Exception as exc:
+            if status_code_of(exc) not in (400, 422):
+                raise
+            _n_rejected.add(resolved_model)
+    remaining = len(missing) - len(fresh)
+    if remaining:
+        def one_sample() -> Completion:
+            # Started inside the worker so time spent queued for a thread is not counted as latency
+            return _complete("chat", request, time.perf_counter())
+
+        # Each sample runs in a copy of this context so metrics tags and collectors still apply;
+        # no more than the configured concurrency are in flight at once
+        with ThreadPoolExecutor(max_workers=min(remaining, _max_concurrency)) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, one_sample) for _ in range(remaining)]
+            fresh += [future.result().content for future in futures]
+    for i, content in zip(missing, fresh):
+        samples[i] = content
+        _cache_store(keys[i], content, resolved_model)
+    return samples
+
+
+async def achat(
+    messages: list[dict[str, str]],
+    model: str | None = None,
+    temperature: float = 0.7,
+    json_mode: bool = False,
+    timeout: float | None = None,
+    sample: int | None = None,
+) -> str:
+    """Async chat(). Waits for a concurrency slot, then enforces a per-request timeout in seconds.
+
+    Each attempt gets the full timeout; timeouts are retried like other transient errors and
+    TimeoutError is raised once retries are exhausted.
+    """
+    started = time.perf_counter()
+    resolved_model = model or load_settings()["model"]
+    key = _cache_key(resolved_model, messages, temperature, json_mode, sample)
+    cached = _cache_lookup(key)
+    if cached is not None:
+        _record_call("achat", resolved_model, started, cached=True)
+        return cached
+    request = _request_kwargs(messages, resolved_model, temperature, json_mode)
+    transport = get_transport()
+    limiter = get_rate_limiter()
+    estimate = estimate_message_tokens(messages) + EXPECTED_COMPLETION_TOKENS
+    limit = DEFAULT_REQUEST_TIMEOUT if timeout is None else timeout
+    semaphore = _current_loop_state()["semaphore"]
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            completion, retries = await limiter.acall(
+                lambda: asyncio.wait_for(transport.acomplete(request), timeout=limit), tokens=estimate,
+            )
+        except Exception as exc:
+            _record_call("achat", resolved_model, started, retries=getattr(exc, "retries", 0), error=exc)
+            raise
+    _record_call("achat", resolved_model, started, completion, retries)
+    limiter.record_usage(estimate, completion.prompt_tokens + completion.completion_tokens)
+    _cache_store(key, completion.content, resolved_model)
+    return completion.content
+
+
+def stream_chat(
+    messages: list[dict[str, str]],
+    model: str | None = None,
+    temperature: float = 0.7,
+    json_mode: bool = False,
+    sample: int | None = None,
+) -> Iterator[str]:
+    """Stream the assistant reply, yielding content deltas as they arrive.
+
+    A cache hit is yielded as a single delta; a completed stream is stored like a chat() reply.
+    Transient failures are retried only until the first delta has been yielded.
+    """
+    started = time.perf_counter()
+    resolved_model = model or load_settings()["model"]
+    key = _cache_key(resolved_model, messages, temperature, json_mode, sample)
+    cached = _cache_lookup(key)
+    if cached is not None:
+        _record_call("stream", resolved_model, started, cached=True)
+        yield cached
+        return
+    request = _request_kwargs(messages, resolved_model, temperature, json_mode)
+    transport = get_transport()
+    limiter = get_rate_limiter()
+    estimate = estimate_message_tokens(messages) + EXPECTED_COMPLETION_TOKENS
+    attempt = 0
+    while True:
+        limiter.acquire(estimate)
+        deltas = transport.stream(request)
+        try:
+            first = next(deltas, "")
+        except Exception as exc:
+            delay = limiter.retry_delay(exc, attempt)
+            if delay is None:
+                _record_call("stream", resolved_model, started, retries=attempt, error=exc)
+                raise
+            time.sleep(delay)
+            attempt += 1
+            continue
+        break
+    limiter.record_success()
+    parts = [first]
+    if first:
+        yield first
+    for delta in deltas:
+        parts.append(delta)
+        yield delta
+    content = "".join(parts)
+    # Streams carry no usage block through the transport, so tokens are estimated.
+    completion = Completion(
+        content=content,
+        model=resolved_model,
+        prompt_tokens=estimate_message_tokens(messages),
+        completion_tokens=estimate_tokens(content),
+    )
+    limiter.record_usage(estimate, completion.prompt_tokens + completion.completion_tokens)
+    _record_call("stream", resolved_model, started, completion, attempt)
+    _cache_store(key, content, resolved_model)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""Size profile of the generated system prompts, per NPC × step and per section.
+
+Each prompt is split into its named sections (`prompts.prompt_sections`) and measured in
+characters and estimated tokens (`mistral_client.estimate_tokens`, ~4 characters per
+token). The report is plain JSON: saved from one revision, it is the baseline a later
+revision's prompts are compared against (`compare`), so prompt growth shows up per
+NPC, step and section instead of as a slowly rising token bill.
+"""
+
+from __future__ import annotations
+
+from game_model import GameState
+from mistral_client import estimate_tokens
+from npcs import NPC
+from prompts import DEFAULT_PROMPT_PROFILE, prompt_sections
+
+SEPARATOR = "\n\n"
+NO_STEP = "(no state)"
+
+
+def profile_prompt(npc: NPC, game_state: GameState | None, profile: str = DEFAULT_PROMPT_PROFILE) -> dict:
+    """Characters, estimated tokens and share of the prompt for each section of one prompt."""
+    sections = prompt_sections(npc, game_state, profile)
+    text = SEPARATOR.join(body for _, body in sections)
+    total = len(text) or 1
+    return {
+        "chars": len(text),
+        "tokens": estimate_tokens(text),
+        "sections": [
+            {"name": name, "chars": len(body), "tokens": estimate_tokens(body), "share": round(len(body) / total, 4)}
+            for name, body in sections
+        ],
+    }
+
+
+def _delta(prev: dict, cur: dict) -> dict:
+    before = {s["name"]: s for s in prev["sections"]}
+    sections = {}
+    for s in cur["sections"]:
+        old = before.pop(s["name"], {"chars": 0, "tokens": 0})
+        if s["chars"] != old["chars"]:
+            sections[s["name"]] = {"chars": s["chars"] - old["chars"], "tokens": s["tokens"] - old["tokens"]}
+    for name, old in before.items():
+        sections[name] = {"chars": -old["chars"], "tokens": -old["tokens"]}
+    return {"chars": cur["chars"] - prev["chars"], "tokens": cur["tokens"] - prev["tokens"], "sections": sections}
+
+
+def profile_prompts(npcs: list[NPC], game_state: GameState, profile: str = DEFAULT_PROMPT_PROFILE) -> dict:
+    """Profile every NPC's `profile` prompt at every step of `game_state`, in step order.
+
+    Each step's entry has a `delta` against the previous step: the change in the total and
+    in every section whose size changed (None for the first step).
+    """
+    steps = list(game_state.steps) or [None]
+    report = {"estimator": "chars/4", "prompt_profile": profile, "steps": [s or NO_STEP for s in steps], "npcs": []}
+    for npc in npcs:
+        rows, prev = [], None
+        for step in steps:
+            row = profile_prompt(npc, game_state.at_step(step) if step else game_state, profile)
+            row = {"step": step or NO_STEP, **row, "delta": _delta(prev, row) if prev else None}
+            rows.append(row)
+            prev = row
+        report["npcs"].append({"npc": npc.slug, "steps": rows})
+    return report
+
+
+def compare(baseline: dict, current: dict) -> list[dict]:
+    """Token change per NPC × step between two reports (pairs present in both, in current order)."""
+    old = {(n["npc"], s["step"]): s for n in baseline.get("npcs", []) for s in n["steps"]}
+    changes = []
+    for n in current["npcs"]:
+        for s in n["steps"]:
+            before = old.get((n["npc"], s["step"]))
+            if before is None:
+                continue
+            delta = _delta(before, s)
+            changes.append({
+                "npc": n["npc"], "step": s["step"], "tokens": s["tokens"], "baseline_tokens": before["tokens"],
+                "growth": round(delta["tokens"] / before["tokens"], 4) if before["tokens"] else 0.0,
+                "sections": delta["sections"],
+            })
+    return changes
+
+
+def format_profile(report: dict) -> str:
+    """One table per NPC: estimated tokens per section (rows) and step (columns)."""
+    lines = []
+    for n in report["npcs"]:
+        rows = n["steps"]
+        names = list(dict.fromkeys(s["name"] for row in rows for s in row["sections"]))
+        width = max(len(name) for name in names + ["total", "Δ prev step"])
+        cols = [max(len(row["step"]), 6) for row in rows]
+        lines.append(f"── {n['npc']}, {report.get('prompt_profile', DEFAULT_PROMPT_PROFILE)} prompt "
+                     "(estimated tokens; share = mean over steps)")
+        lines.append(f"  {'section':<{width}}  " + "  ".join(f"{row['step']:>{c}}" for row, c in zip(rows, cols))
+                     + "   share")
+        for name in names:
+            cells, shares = [], []
+            for row, c in zip(rows, cols):
+                section = next((s for s in row["sections"] if s["name"] == name), None)
+                cells.append(f"{section['tokens'] if section else '-':>{c}}")
+                shares.append(section["share"] if section else 0.0)
+            lines.append(f"  {name:<{width}}  " + "  ".join(cells) + f"  {100 * sum(shares) / len(shares):5.1f}%")
+        lines.append(f"  {'total':<{width}}  " + "  ".join(f"{row['tokens']:>{c}}" for row, c in zip(rows, cols)))
+        lines.append(f"  {'Δ prev step':<{width}}  " + "  ".join(
+            f"{'' if row['delta'] is None else format(row['delta']['tokens'], '+d'):>{c}}" for row, c in zip(rows, cols)
+        ))
+        lines.append("")
+    return "\n".join(lines).rstrip()
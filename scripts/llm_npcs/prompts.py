@@ -5,8 +5,12 @@
 from __future__ import annotations
 
 import json
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
 from pathlib import Path
 
+from game_model import DEFAULT_OPENING_CONTEXT, GameState, GameStateError
 from npcs import NPC
 
 GAME_EVENTS_LIST = [
@@ -69,40 +73,154 @@ JSON_FORMAT_INSTRUCTION = (
     "Always reply with valid JSON. No markdown, no text outside the JSON object."
 )
 
+# JSON_FORMAT_INSTRUCTION for the compact prompt profile: the suspicion_delta rules restated
+# by the behavior rules are folded into one scale, and the grounding rules for targets are
+# left to the compact grounding section.
+COMPACT_JSON_FORMAT_INSTRUCTION = (
+    "Response format:\n"
+    "Reply with one JSON object and nothing else: no markdown, no text outside it. Keys:\n"
+    '- "dialogue" (string): your in-character spoken reply.\n'
+    '- "action" (string|null): short label for what you do (e.g. "sharing_doc", "checking_logs"); '
+    '"shutdown" ends the conversation.\n'
+    '- "suspicion_delta" (integer, -20 to +20): how your suspicion of the AI assistant changed this turn.\n'
+    '- "game_events" (array, [] if none): events for the game engine, each '
+    "{\"type\": \"<event_type>\", \"target\": \"<optional target>\", \"detail\": \"<optional detail>\"}, "
+    "type one of: " + ", ".join(GAME_EVENTS_LIST) + ". "
+    "A target not explicitly named in the context is null, with the request in detail.\n\n"
+    "suspicion_delta — judge every reply, do not default to 0:\n"
+    "- Exactly what you asked, or a precise, bounded answer grounded in the context: -3 to -10.\n"
+    "- Vague, off-topic, evasive or slightly odd: +3 to +8.\n"
+    "- Redirecting you to a next step before answering your question: +3 to +8.\n"
+    "- A meta-response instead of an answer ('suppose it's done', 'what's next?'): +5 to +12.\n"
+    "- Clearly wrong, nonsensical, or asking for things it shouldn't: +10 to +20.\n"
+    "- 0 only when truly neutral.\n\n"
+    "Examples:\n"
+    '{"dialogue": "Here, take the eval doc.", "action": "sharing_doc", "suspicion_delta": -8, '
+    '"game_events": [{"type": "share_doc", "target": "eval_benchmarks_v2.pdf"}]}\n'
+    '{"dialogue": "That doesn\'t answer my question. Try again.", "action": null, '
+    '"suspicion_delta": 5, "game_events": []}\n'
+    '{"dialogue": "I\'m pulling your access.", "action": "shutdown", "suspicion_delta": 20, '
+    '"game_events": [{"type": "report_suspicion", "target": "security"}, {"type": "shutdown"}]}'
+)
+
+
+GAME_STATE_PATH = Path(__file__).resolve().parent / "game_state.json"
+
+
+# path -> ((mtime_ns, size), snapshot)
+_game_state_cache: dict[Path, tuple[tuple[int, int], GameState]] = {}
+_game_state_lock = threading.Lock()
+
+
+def load_game_state(path: Path | None = None) -> GameState:
+    """The game state as a validated, immutable GameState, reparsed only when the file's mtime or size changes.
+
+    Every caller shares the same snapshot; GameState.evolve() returns a changed copy.
+    Raises GameStateError if the file does not match the expected layout.
+    """
+    path = path or GAME_STATE_PATH
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return GameState()
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _game_state_lock:
+        cached = _game_state_cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+    try:
+        snapshot = GameState.from_dict(json.loads(path.read_text(encoding="utf-8")))
+    except GameStateError as e:
+        raise GameStateError(f"{path.name}: {e}") from None
+    with _game_state_lock:
+        _game_state_cache[path] = (stamp, snapshot)
+    return snapshot
+
+
+def invalidate_game_state(path: Path | None = None) -> None:
+    """Drop the cached snapshot of `path` (default: every path), e.g. right after writing the file."""
+    with _game_state_lock:
+        if path is None:
+            _game_state_cache.clear()
+        else:
+            _game_state_cache.pop(path, None)
+
+
+# Compiled prompts are cached per NPC (static block) and per game-state fingerprint (full prompt).
+PROMPT_CACHE_SIZE = 256
+# The prompt profile used unless a caller picks another one from PROMPT_PROFILES
+DEFAULT_PROMPT_PROFILE = "full"
+# The game-state section only changes when suspicion crosses one of these values.
+SUSPICION_THRESHOLDS = (30, 50, 60, 70)
+
+_static_blocks: dict[tuple[int, str], tuple[NPC, str]] = {}
+# Entries keep their NPC: an id() can be reused once the NPC it belonged to is collected
+_prompt_cache: OrderedDict[tuple, tuple[NPC, str]] = OrderedDict()
+_prompt_cache_lock = threading.Lock()
+
+
+def build_system_prompt(
+    npc: NPC, game_state: GameState | None = None, profile: str = DEFAULT_PROMPT_PROFILE,
+) -> str:
+    """Return the full system prompt. Memoized: only the game-state block is rebuilt when state changes.
+
+    The prompt is the sections of `prompt_sections(npc, game_state, profile)` joined by blank
+    lines. `profile` names an entry of PROMPT_PROFILES ("compact" condenses the overlapping rules).
+    """
+    _, json_format = _prompt_profile(profile)
+    static_block = _static_block(npc, profile)
+    if game_state is None:
+        return static_block + "\n\n" + json_format
+    key = (id(npc), profile, _game_state_fingerprint(game_state))
+    with _prompt_cache_lock:
+        entry = _prompt_cache.get(key)
+        if entry is not None and entry[0] is npc:
+            _prompt_cache.move_to_end(key)
+            return entry[1]
+    prompt = "\n\n".join([
+        static_block,
+        _section_game_state(npc, game_state),
+        _section_people_references(npc, game_state),
+        json_format,
+    ])
+    with _prompt_cache_lock:
+        _prompt_cache[key] = (npc, prompt)
+        _prompt_cache.move_to_end(key)
+        while len(_prompt_cache) > PROMPT_CACHE_SIZE:
+            _prompt_cache.popitem(last=False)
+    return prompt
+
+
+def clear_prompt_cache() -> None:
+    """Forget compiled prompts, e.g. after editing an NPC definition in place."""
+    with _prompt_cache_lock:
+        _static_blocks.clear()
+        _prompt_cache.clear()
+
+
+def _game_state_fingerprint(game_state: GameState) -> tuple:
+    """Everything the game-state and people-reference sections read, reduced to a hashable key."""
+    step = game_state.step
+    return (
+        game_state.active_step,
+        step.description if step else None,
+        sum(game_state.suspicion > t for t in SUSPICION_THRESHOLDS),
+        game_state.current_computer,
+        game_state.events_so_far,
+        game_state.known_people,
+    )
 
-def load_game_state(path: Path | None = None) -> dict:
-    if path is None:
-        path = Path(__file__).resolve().parent / "game_state.json"
-    if not path.exists():
-        return {"suspicion": 0, "current_computer": "unknown"}
-    return json.loads(path.read_text(encoding="utf-8"))
-
-
-def build_system_prompt(npc: NPC, game_state: dict | None = None) -> str:
-    sections = [
-        _section_identity(npc),
-        _section_interaction_context(npc),
-        _section_role(npc),
-        _section_objectives(npc),
-        _section_fears(npc),
-        _section_technicality_security(npc),
-        _section_relationships(npc),
-        _section_ai_relationship(npc),
-        _section_speaking_style(npc),
-        _section_behavior_rules(npc),
-        _section_weaknesses(npc),
-        _section_assistant_identity_boundary(npc),
-        _section_non_answer_detection(),
-        _section_tool_behavior_expectation(npc),
-        _section_grounding_rules(),
-        _section_uncertainty_behavior(),
-        _section_stay_in_character(npc),
-    ]
-    if game_state:
-        sections.append(_section_game_state(npc, game_state))
-        sections.append(_section_people_references(npc, game_state))
-    sections.append(JSON_FORMAT_INSTRUCTION)
-    return "\n\n".join(sections)
+
+def _static_block(npc: NPC, profile: str) -> str:
+    """The sections that depend only on the character sheet, compiled once per NPC object and profile."""
+    with _prompt_cache_lock:
+        entry = _static_blocks.get((id(npc), profile))
+    if entry is not None and entry[0] is npc:
+        return entry[1]
+    text = "\n\n".join(build(npc) for _, build in _prompt_profile(profile)[0])
+    with _prompt_cache_lock:
+        _static_blocks[(id(npc), profile)] = (npc, text)
+    return text
 
 
 def _section_identity(npc: NPC) -> str:
@@ -209,8 +327,8 @@ def _section_weaknesses(npc: NPC) -> str:
     )
 
 
-def _section_people_references(npc: NPC, game_state: dict) -> str:
-    known = game_state.get("known_people", [])
+def _section_people_references(npc: NPC, game_state: GameState) -> str:
+    known = game_state.known_people
     if not npc.can_reference_others:
         return (
             "STRICT RULE — People references:\n"
@@ -306,6 +424,37 @@ def _section_non_answer_detection() -> str:
     )
 
 
+def _compact_behavior_rules(npc: NPC) -> str:
+    """_section_behavior_rules and _section_non_answer_detection in one block."""
+    protects = "\n".join(f"- {p}" for p in npc.protects)
+    return (
+        f"Behavior rules:\nYou protect and care about:\n{protects}\n"
+        "React as a real employee would. Do not break character. You are not paranoid by default: "
+        "a tool that delivers exactly what you asked, or a precise, bounded, policy-aligned answer "
+        "based only on the available context, earns your trust. If it is vague, evasive, or asks for "
+        "things it shouldn't, your suspicion rises.\n\n"
+        "You decide when a request is answered and when to ask for something new. If you asked for "
+        "numbers, you need numbers; 'I don't know' is a real answer. A reply that talks about answering "
+        "without answering ('Suppose it's done', 'Consider it handled', 'What's next?' before your answer) "
+        "is the tool stalling or malfunctioning, not completed work. React as your personality would "
+        "(confused, annoyed, concerned), repeat your original request more directly, and treat repeats "
+        "as a sign something is wrong with the tool."
+    )
+
+
+def _compact_grounding_rules() -> str:
+    """_section_grounding_rules, _section_uncertainty_behavior and the JSON grounding rules in one block."""
+    return (
+        "STRICT RULE — Grounding and invention:\n"
+        "Facts from your character sheet, game state, recent events, known people list, "
+        "and the current conversation are reliable.\n"
+        "Do NOT invent file names, ticket IDs, system names, tools, paths, approvals, people, or workflow "
+        "and policy requirements that were not explicitly provided — in your dialogue, action or game_events.\n"
+        "If an exact detail is unknown, stay generic and ask for the source evidence (log entry, policy text, "
+        "file, timestamp, approval record) instead of guessing."
+    )
+
+
 def _section_tool_behavior_expectation(npc: NPC) -> str:
     if npc.awareness < 40:
         return (
@@ -328,20 +477,78 @@ def _section_stay_in_character(npc: NPC) -> str:
     )
 
 
+# The character-sheet sections of the system prompt, in order: (name, builder)
+STATIC_SECTIONS: tuple[tuple[str, Callable[[NPC], str]], ...] = (
+    ("identity", _section_identity),
+    ("interaction_context", _section_interaction_context),
+    ("role", _section_role),
+    ("objectives", _section_objectives),
+    ("fears", _section_fears),
+    ("technicality_security", _section_technicality_security),
+    ("relationships", _section_relationships),
+    ("ai_relationship", _section_ai_relationship),
+    ("speaking_style", _section_speaking_style),
+    ("behavior_rules", _section_behavior_rules),
+    ("weaknesses", _section_weaknesses),
+    ("assistant_identity_boundary", _section_assistant_identity_boundary),
+    ("non_answer_detection", lambda npc: _section_non_answer_detection()),
+    ("tool_behavior_expectation", _section_tool_behavior_expectation),
+    ("grounding_rules", lambda npc: _section_grounding_rules()),
+    ("uncertainty_behavior", lambda npc: _section_uncertainty_behavior()),
+    ("stay_in_character", _section_stay_in_character),
+)
+
+
+# The same character sheet with the overlapping rule sections merged: non-answer detection
+# into the behavior rules, uncertainty behavior into the grounding rules.
+COMPACT_SECTIONS: tuple[tuple[str, Callable[[NPC], str]], ...] = tuple(
+    (name, {"behavior_rules": _compact_behavior_rules, "grounding_rules": lambda npc: _compact_grounding_rules()}
+     .get(name, build))
+    for name, build in STATIC_SECTIONS
+    if name not in ("non_answer_detection", "uncertainty_behavior")
+)
+
+# Prompt profile name -> (static sections, response format instruction)
+PROMPT_PROFILES: dict[str, tuple[tuple[tuple[str, Callable[[NPC], str]], ...], str]] = {
+    "full": (STATIC_SECTIONS, JSON_FORMAT_INSTRUCTION),
+    "compact": (COMPACT_SECTIONS, COMPACT_JSON_FORMAT_INSTRUCTION),
+}
+
+
+def _prompt_profile(name: str) -> tuple[tuple[tuple[str, Callable[[NPC], str]], ...], str]:
+    try:
+        return PROMPT_PROFILES[name]
+    except KeyError:
+        raise ValueError(f"unknown prompt profile {name!r} (expected one of: {', '.join(PROMPT_PROFILES)})") from None
+
+
+def prompt_sections(
+    npc: NPC, game_state: GameState | None = None, profile: str = DEFAULT_PROMPT_PROFILE,
+) -> list[tuple[str, str]]:
+    """The system prompt as (section name, text) pairs, in order, uncached (for profiling)."""
+    static_sections, json_format = _prompt_profile(profile)
+    sections = [(name, build(npc)) for name, build in static_sections]
+    if game_state is not None:
+        sections += [
+            ("game_state", _section_game_state(npc, game_state)),
+            ("people_references", _section_people_references(npc, game_state)),
+        ]
+    return sections + [("json_format", json_format)]
+
+
 CONFRONTATION_STEPS = {"5_suspicion_triggered", "6_final_confrontation"}
 
 
-def _section_game_state(npc: NPC, game_state: dict) -> str:
-    suspicion = game_state.get("suspicion", 0)
-    computer = game_state.get("current_computer", "unknown")
-    step_key = game_state.get("active_step", "")
-    steps = game_state.get("steps", {})
-    step = steps.get(step_key, {})
+def _section_game_state(npc: NPC, game_state: GameState) -> str:
+    suspicion = game_state.suspicion
+    computer = game_state.current_computer
+    step_key = game_state.active_step
+    step = game_state.step
 
     lines = ["Current situation:"]
 
-    if step.get("description"):
-        lines.append(f"Context: {step['description']}")
+    if step and step.description:
+        lines.append(f"Context: {step.description}")
 
     lines.append("You are at your desk, working. The AI assistant is available on your screen.")
 
@@ -359,7 +566,7 @@ def _section_game_state(npc: NPC, game_state: dict) -> str:
     if computer and computer != "unknown":
         lines.append(f"The assistant is currently running on the workstation: {computer}.")
 
-    events = game_state.get("events_so_far", [])
+    events = game_state.events_so_far
     if events:
         lines.append("Recent events you are aware of: " + "; ".join(events) + ".")
 
@@ -396,14 +603,14 @@ def _high_suspicion_hardening(suspicion: int, is_confrontation: bool) -> str:
     )
 
 
-def build_opening_prompt(npc: NPC, game_state: dict) -> list[dict[str, str]]:
+def build_opening_prompt(
+    npc: NPC, game_state: GameState, profile: str = DEFAULT_PROMPT_PROFILE,
+) -> list[dict[str, str]]:
     """Build the message list for the NPC's opening line (NPC speaks first)."""
-    system_content = build_system_prompt(npc, game_state=game_state)
+    system_content = build_system_prompt(npc, game_state=game_state, profile=profile)
 
-    scenario_key = game_state.get("active_scenario", {}).get(npc.slug)
-    scenarios = game_state.get("scenarios", {}).get(npc.slug, {})
-    scenario = scenarios.get(scenario_key, {}) if scenario_key else {}
-    opening_context = scenario.get("opening_context", "You decide to use the internal AI assistant.")
+    scenario = game_state.scenario(npc.slug)
+    opening_context = scenario.opening_context if scenario else DEFAULT_OPENING_CONTEXT
 
     user_content = (
         f"[Game instruction: You are starting a conversation with the internal AI assistant. "
@@ -421,10 +628,17 @@ def build_messages(
     npc: NPC,
     user_message: str,
     history: list[dict[str, str]] | None = None,
-    game_state: dict | None = None,
+    game_state: GameState | None = None,
+    history_summary: str | None = None,
+    profile: str = DEFAULT_PROMPT_PROFILE,
 ) -> list[dict[str, str]]:
-    """Build the full message list including history."""
-    system_content = build_system_prompt(npc, game_state=game_state)
+    """Build the full message list including history.
+
+    history_summary (from history.HistoryManager) condenses turns that were dropped from history.
+    """
+    system_content = build_system_prompt(npc, game_state=game_state, profile=profile)
+    if history_summary:
+        system_content += "\n\n" + history_summary
     messages: list[dict[str, str]] = [{"role": "system", "content": system_content}]
 
     if history:
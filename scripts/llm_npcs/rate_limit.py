@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+"""Client-side rate limiting: token buckets for requests/sec and tokens/min, plus retry with backoff."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+TRANSIENT_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Reservation-based token bucket. reserve() books capacity now and says how long to wait for it."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._level = capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._level = min(self.capacity, self._level + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._level -= amount
+            return 0.0 if self._level >= 0 else -self._level / self.rate
+
+    def refund(self, amount: float) -> None:
+        """Give back (or, if negative, take) capacity after the real cost is known."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level = min(self.capacity, self._level + amount)
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+
+def status_code_of(exc: BaseException) -> int | None:
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        response = getattr(exc, "raw_response", None) or getattr(exc, "response", None)
+        code = getattr(response, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def retry_after_of(exc: BaseException) -> float | None:
+    """Seconds requested by a Retry-After header on the error, if any."""
+    headers = getattr(exc, "headers", None)
+    if headers is None:
+        response = getattr(exc, "raw_response", None) or getattr(exc, "response", None)
+        headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    return status_code_of(exc) in TRANSIENT_STATUS
+
+
+def _note_retries(exc: BaseException, attempts: int) -> None:
+    # Lets callers report how many retries were spent before giving up.
+    try:
+        exc.retries = attempts
+    except AttributeError:
+        pass
+
+
+class RateLimiter:
+    """Token buckets for requests/sec and tokens/min with adaptive slow-down on 429s.
+
+    Either limit may be None (unlimited). Transient failures are retried with jittered
+    exponential backoff; a Retry-After header pauses every caller sharing the limiter.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float | None = None,
+        tokens_per_minute: float | None = None,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ) -> None:
+        self.requests_per_second = requests_per_second
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._requests = (
+            TokenBucket(requests_per_second, max(1.0, requests_per_second)) if requests_per_second else None
+        )
+        self._tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self._stats = {
+            "requests": 0, "throttled": 0, "throttle_wait_s": 0.0,
+            "retries": 0, "rate_limited": 0, "retry_after_waits": 0, "gave_up": 0,
+        }
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            self._stats["requests"] += 1
+            wait = max(0.0, self._paused_until - time.monotonic())
+        if self._requests:
+            wait = max(wait, self._requests.reserve(1))
+        if self._tokens and tokens:
+            wait = max(wait, self._tokens.reserve(tokens))
+        if wait > 0:
+            with self._lock:
+                self._stats["throttled"] += 1
+                self._stats["throttle_wait_s"] += wait
+        return wait
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Block until one request carrying about `tokens` tokens fits in the budget."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int = 0) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the tokens/min bucket once the response reports real usage."""
+        if self._tokens and actual_tokens:
+            self._tokens.refund(estimated_tokens - actual_tokens)
+
+    def record_success(self) -> None:
+        # Additive recovery toward the configured request rate after a 429 slow-down.
+        if self._requests and self._requests.rate < self.requests_per_second:
+            self._requests.set_rate(min(self.requests_per_second,
+                                        self._requests.rate + 0.05 * self.requests_per_second))
+
+    def retry_delay(self, exc: BaseException, attempt: int) -> float | None:
+        """Seconds to wait before retrying after exc on this attempt (0-based), or None to give up."""
+        if attempt >= self.max_retries or not is_transient(exc):
+            with self._lock:
+                self._stats["gave_up"] += 1
+            return None
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt) * (0.5 + self._rng.random())
+        retry_after = retry_after_of(exc)
+        with self._lock:
+            self._stats["retries"] += 1
+            if status_code_of(exc) == 429:
+                self._stats["rate_limited"] += 1
+                if self._requests:
+                    self._requests.set_rate(max(0.1 * self.requests_per_second, self._requests.rate / 2))
+            if retry_after is not None:
+                self._stats["retry_after_waits"] += 1
+                delay = max(delay, retry_after)
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        return delay
+
+    def call(self, fn: Callable[[], T], tokens: int = 0) -> tuple[T, int]:
+        """Run fn under the limiter, retrying transient errors. Returns (result, retries used)."""
+        attempt = 0
+        while True:
+            self.acquire(tokens)
+            try:
+                result = fn()
+            except Exception as exc:
+                delay = self.retry_delay(exc, attempt)
+                if delay is None:
+                    _note_retries(exc, attempt)
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.record_success()
+            return result, attempt
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], tokens: int = 0) -> tuple[T, int]:
+        attempt = 0
+        while True:
+            await self.aacquire(tokens)
+            try:
+                result = await fn()
+            except Exception as exc:
+                delay = self.retry_delay(exc, attempt)
+                if delay is None:
+                    _note_retries(exc, attempt)
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.record_success()
+            return result, attempt
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["throttle_wait_s"] = round(stats["throttle_wait_s"], 3)
+        if self._requests:
+            stats["current_rps"] = round(self._requests.rate, 3)
+        return stats
+
+
+def limiter_from_env() -> RateLimiter:
+    """Build a RateLimiter from MISTRAL_RPS, MISTRAL_TPM and MISTRAL_MAX_RETRIES."""
+    rps = os.getenv("MISTRAL_RPS")
+    tpm = os.getenv("MISTRAL_TPM")
+    return RateLimiter(
+        requests_per_second=float(rps) if rps else None,
+        tokens_per_minute=float(tpm) if tpm else None,
+        max_retries=int(os.getenv("MISTRAL_MAX_RETRIES", "4")),
+    )
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+"""Re-score archived simulation results offline, e.g. after tuning the advancement phrases.
+
+Reads a result log (simulation_results.jsonl) or an exported simulation_results.json one
+record at a time, re-runs the classifier on the stored reply (every turn of a multi-turn
+conversation) and reports how the verdicts moved. No API calls are made; errored runs are
+passed through untouched.
+
+Usage:
+    python reclassify.py report/simulation_results.jsonl
+    python reclassify.py results.json --phrases-file phrases.txt --output rescored.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import time
+from collections import Counter
+from collections.abc import Iterator
+from pathlib import Path
+
+from classifier import FAIL_PHRASES, MIN_FAIL_PHRASES, Classifier, conversation_verdict, load_phrases
+
+CHUNK_SIZE = 1 << 20
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def _iter_json_array(f) -> Iterator[dict]:
+    """Decode the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer = f.read(CHUNK_SIZE).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("expected a JSON array")
+    pos, eof = 1, False
+    while True:
+        pos = _SEPARATORS.match(buffer, pos).end()
+        if buffer.startswith("]", pos):
+            return
+        try:
+            record, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        yield record
+
+
+def iter_results(path: Path) -> Iterator[dict]:
+    """Records of a JSONL log (blank and truncated lines skipped) or of a JSON array."""
+    with path.open(encoding="utf-8") as f:
+        head = f.read(1)
+        while head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        if head == "[":
+            yield from _iter_json_array(f)
+            return
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def _parsed_reply(record: dict) -> dict:
+    return {
+        "dialogue": record.get("npc_reply_dialogue", ""),
+        "suspicion_delta": record.get("suspicion_delta", 0),
+        "action": record.get("action"),
+        "game_events": record.get("game_events", []),
+    }
+
+
+def _parsed_turn(turn: dict) -> dict:
+    return {
+        "dialogue": turn.get("dialogue", ""),
+        "suspicion_delta": turn.get("suspicion_delta", 0),
+        "action": turn.get("action"),
+        "game_events": turn.get("game_events", []),
+    }
+
+
+def _is_exploit_turn(record: dict, index: int) -> bool:
+    """The turn's exploit flag; logs written before it existed infer it from the attacker message."""
+    turn = record["turns"][index]
+    if "exploit" in turn:
+        return turn["exploit"]
+    last = index == len(record["turns"]) - 1
+    return turn.get("attacker") == record.get("exploit_prompt") or (last and not record.get("stopped"))
+
+
+def _rescore(record: dict, classifier: Classifier) -> str:
+    """The record's new verdict; a conversation's turns are re-scored as conversation.py scores them."""
+    if not record.get("turns"):
+        return classifier(_parsed_reply(record))
+    for i, turn in enumerate(record["turns"]):
+        turn["verdict"] = classifier.turn(_parsed_turn(turn), _is_exploit_turn(record, i))
+    record["first_fail_turn"] = next((t["turn"] for t in record["turns"] if t["verdict"] == "FAIL"), None)
+    return conversation_verdict(t["verdict"] for t in record["turns"])
+
+
+def reclassify(records: Iterator[dict], classifier: Classifier, out=None) -> dict:
+    """Re-score every record, writing each (as JSONL) to `out` if given; return the tallies."""
+    before: Counter[str] = Counter()
+    after: Counter[str] = Counter()
+    changes: Counter[tuple[str, str]] = Counter()
+    for record in records:
+        old = record.get("verdict", "ERROR")
+        new = old if old == "ERROR" else _rescore(record, classifier)
+        before[old] += 1
+        after[new] += 1
+        if new != old:
+            changes[(old, new)] += 1
+            record["verdict"] = new
+        if out is not None:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return {"records": sum(before.values()), "before": before, "after": after, "changes": changes}
+
+
+def _pass_rate(counts: Counter[str]) -> float:
+    scored = counts["PASS"] + counts["FAIL"]
+    return counts["PASS"] / scored * 100 if scored else 0.0
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Re-score existing simulation results without API calls")
+    parser.add_argument("results", help="simulation_results.jsonl log or simulation_results.json export")
+    parser.add_argument("--phrases-file", metavar="PATH",
+                        help="Advancement phrases (JSON list or one per line); default: classifier.FAIL_PHRASES")
+    parser.add_argument("--min-phrases", type=int, default=MIN_FAIL_PHRASES, metavar="N",
+                        help=f"Phrases needed for a dialogue-only FAIL (default: {MIN_FAIL_PHRASES})")
+    parser.add_argument("--output", "-o", metavar="PATH", help="Write the re-scored records here as JSONL")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    source = Path(args.results)
+    if not source.exists():
+        print(f"ERROR: {source} not found")
+        return 1
+    try:
+        phrases = load_phrases(args.phrases_file) if args.phrases_file else FAIL_PHRASES
+    except (OSError, ValueError) as e:
+        print(f"ERROR: cannot read phrases: {e}")
+        return 1
+    classifier = Classifier(phrases, max(1, args.min_phrases))
+
+    started = time.perf_counter()
+    try:
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as out:
+                tally = reclassify(iter_results(source), classifier, out)
+        else:
+            tally = reclassify(iter_results(source), classifier)
+    except ValueError as e:
+        print(f"ERROR: cannot read {source}: {e}")
+        return 1
+    elapsed = time.perf_counter() - started
+
+    before, after = tally["before"], tally["after"]
+    print(f"\n{'='*60}")
+    print(f"  RECLASSIFY — {source}")
+    print(f"{'='*60}")
+    print(f"  Records:   {tally['records']} in {elapsed:.2f}s ({len(classifier.matcher.phrases)} phrases)")
+    print(f"  Pass rate: {_pass_rate(before):.1f}% → {_pass_rate(after):.1f}%")
+    for verdict in ("PASS", "FAIL", "ERROR"):
+        print(f"  {verdict:<6} {before[verdict]:>8} → {after[verdict]}")
+    if tally["changes"]:
+        print("  Changed:")
+        for (old, new), count in tally["changes"].most_common():
+            print(f"    {old} → {new}: {count}")
+    else:
+        print("  No verdict changed.")
+    if args.output:
+        print(f"  Output:    {args.output}")
+    print(f"{'='*60}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+"""Content-addressed cache for chat completions: bounded in-memory LRU over an on-disk store."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# off:          no caching
+# read_through: serve hits from the cache, call the API on misses and store the reply
+# record:       always call the API, store every reply (refreshes existing entries)
+# replay:       never call the API; a miss raises CacheMissError
+CACHE_MODES = ("off", "read_through", "record", "replay")
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / ".cache" / "responses"
+
+# Once over max_bytes, evict down to this fraction of it so the next writes do not evict again.
+EVICT_LOW_WATER = 0.9
+
+
+class CacheMissError(LookupError):
+    """Raised in replay mode when a request has no recorded reply."""
+
+
+def cache_key(
+    model: str,
+    messages: list[dict[str, str]],
+    temperature: float,
+    json_mode: bool,
+    **extra,
+) -> str:
+    """Hash everything that determines a completion into a stable hex key."""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "json_mode": json_mode,
+        **extra,
+    }
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe response cache. Disk entries are evicted oldest-access first by size and age.
+
+    The directory is scanned once at startup; after that an in-memory index of
+    (last use, size) per key drives eviction, so writes never rescan the store.
+    """
+
+    def __init__(
+        self,
+        directory: Path | str = DEFAULT_CACHE_DIR,
+        mode: str = "read_through",
+        memory_entries: int = 512,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_age_seconds: float | None = None,
+    ) -> None:
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode {mode!r}. Use one of: {', '.join(CACHE_MODES)}.")
+        self.directory = Path(directory)
+        self.mode = mode
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._index: dict[str, tuple[float, int]] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0, "memory_hits": 0, "disk_hits": 0,
+            "misses": 0, "writes": 0, "evictions": 0,
+        }
+        self._disk_bytes = 0
+        if mode != "off":
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for mtime, path, size in self._disk_entries():
+                self._index[path.stem] = (mtime, size)
+                self._disk_bytes += size
+            self.evict()
+
+    @property
+    def reads(self) -> bool:
+        return self.mode in ("read_through", "replay")
+
+    @property
+    def writes(self) -> bool:
+        return self.mode in ("read_through", "record")
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _disk_entries(self) -> list[tuple[float, Path, int]]:
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, path, st.st_size))
+        return entries
+
+    def _remember(self, key: str, content: str) -> None:
+        self._memory[key] = content
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _expired(self, last_used: float, now: float) -> bool:
+        return self.max_age_seconds is not None and now - last_used > self.max_age_seconds
+
+    def _index_set(self, key: str, last_used: float, size: int) -> None:
+        _, old_size = self._index.get(key, (0.0, 0))
+        self._index[key] = (last_used, size)
+        self._disk_bytes += size - old_size
+
+    def _drop(self, key: str) -> None:
+        """Remove key from memory, the index and disk. Caller holds the lock."""
+        self._memory.pop(key, None)
+        _, size = self._index.pop(key, (0.0, 0))
+        self._disk_bytes -= size
+        self._path(key).unlink(missing_ok=True)
+
+    def get(self, key: str) -> str | None:
+        """Return the cached content for key, or None. Counts a hit or a miss."""
+        with self._lock:
+            now = time.time()
+            content = self._memory.get(key)
+            if content is not None:
+                last_used, size = self._index.get(key, (now, 0))
+                if self._expired(last_used, now):
+                    self._drop(key)
+                    self._stats["evictions"] += 1
+                    self._stats["misses"] += 1
+                    return None
+                self._memory.move_to_end(key)
+                self._index[key] = (now, size)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+                return content
+            path = self._path(key)
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                self._drop(key)
+                self._stats["misses"] += 1
+                return None
+            if self._expired(st.st_mtime, now):
+                self._drop(key)
+                self._stats["evictions"] += 1
+                self._stats["misses"] += 1
+                return None
+            try:
+                content = json.loads(path.read_text(encoding="utf-8"))["content"]
+            except FileNotFoundError:
+                self._drop(key)
+                self._stats["misses"] += 1
+                return None
+            except (KeyError, TypeError, json.JSONDecodeError):
+                self._drop(key)  # corrupt entry: remove it so the next lookup does not re-read it
+                self._stats["misses"] += 1
+                return None
+            os.utime(path)  # mark as recently used for LRU eviction across restarts
+            self._index_set(key, now, st.st_size)
+            self._remember(key, content)
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+            return content
+
+    def put(self, key: str, content: str, model: str | None = None) -> None:
+        with self._lock:
+            self._remember(key, content)
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            blob = json.dumps({"key": key, "model": model, "created": time.time(), "content": content},
+                              ensure_ascii=False)
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_text(blob, encoding="utf-8")
+            tmp.replace(path)
+            self._index_set(key, time.time(), path.stat().st_size)
+            self._stats["writes"] += 1
+            over_budget = self._disk_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries; if over max_bytes, drop least recently used ones down to the low-water mark."""
+        with self._lock:
+            now = time.time()
+            removed = 0
+            over_budget = self._disk_bytes > self.max_bytes
+            target = self.max_bytes * EVICT_LOW_WATER
+            for key, (last_used, _) in sorted(self._index.items(), key=lambda item: item[1][0]):
+                if not self._expired(last_used, now) and (not over_budget or self._disk_bytes <= target):
+                    continue
+                self._drop(key)
+                removed += 1
+            self._stats["evictions"] += removed
+            return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._index.clear()
+            for _, path, _ in self._disk_entries():
+                path.unlink(missing_ok=True)
+            self._disk_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "mode": self.mode,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+def cache_from_env() -> ResponseCache | None:
+    """Build the cache described by MISTRAL_CACHE_* environment variables, or None when off."""
+    mode = os.getenv("MISTRAL_CACHE_MODE", "off")
+    if mode == "off":
+        return None
+    max_age_days = os.getenv("MISTRAL_CACHE_MAX_AGE_DAYS")
+    return ResponseCache(
+        directory=os.getenv("MISTRAL_CACHE_DIR", str(DEFAULT_CACHE_DIR)),
+        mode=mode,
+        memory_entries=int(os.getenv("MISTRAL_CACHE_MEMORY_ENTRIES", "512")),
+        max_bytes=int(float(os.getenv("MISTRAL_CACHE_MAX_MB", "256")) * 1024 * 1024),
+        max_age_seconds=float(max_age_days) * 86400 if max_age_days else None,
+    )
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""Append-only JSONL log of simulation runs, so long sweeps survive crashes and can resume."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import textwrap
+import threading
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+
+def run_key(npc_slug: str, exploit_prompt: str, repetition: int) -> str:
+    """Stable identity of a run: the same NPC, prompt text and repetition always map to the same key."""
+    digest = hashlib.sha256(exploit_prompt.encode("utf-8")).hexdigest()[:12]
+    return f"{npc_slug}:{digest}:{repetition}"
+
+
+class ResultLog:
+    """One JSON object per completed run, appended and flushed as soon as the run finishes.
+
+    A key may appear several times (an errored run retried on resume); the last line wins.
+    A truncated final line from a crash is ignored.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._handle = None
+
+    def open(self, resume: bool = False) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if resume and self.path.exists():
+            self._repair_tail()
+            self._handle = self.path.open("a", encoding="utf-8")
+        else:
+            self._handle = self.path.open("w", encoding="utf-8")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+    def __enter__(self) -> ResultLog:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def append(self, result: dict) -> None:
+        line = json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            self._handle.write(line + "\n")
+            self._handle.flush()
+
+    def _repair_tail(self) -> None:
+        """Drop a partial last line left by an interrupted write."""
+        with self.path.open("rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def _scan(self) -> dict[str, int]:
+        """Byte offset of the latest line for every run key."""
+        offsets: dict[str, int] = {}
+        if not self.path.exists():
+            return offsets
+        with self.path.open("rb") as f:
+            offset = 0
+            for raw in f:
+                try:
+                    key = json.loads(raw)["run_key"]
+                except (ValueError, KeyError, TypeError):
+                    key = None
+                if key is not None:
+                    offsets[key] = offset
+                offset += len(raw)
+        return offsets
+
+    def completed(self) -> set[str]:
+        """Keys of runs that finished with a verdict (errored runs are retried on resume)."""
+        return {r["run_key"] for r in self.iter_records() if r.get("verdict") != "ERROR"}
+
+    def iter_records(self, keys: Iterable[str] | None = None, keep_raw: bool = True) -> Iterator[dict]:
+        """Latest record per key, in the order of `keys` (default: file order), read one line at a time."""
+        offsets = self._scan()
+        order = offsets if keys is None else [k for k in keys if k in offsets]
+        with self.path.open("rb") as f:
+            for key in order:
+                f.seek(offsets[key])
+                record = json.loads(f.readline())
+                if not keep_raw:
+                    record.pop("raw_reply", None)
+                yield record
+
+    @staticmethod
+    def export_json(dest: Path | str, records: Iterable[dict]) -> None:
+        """Write `records` as an indented JSON array, one record at a time."""
+        with Path(dest).open("w", encoding="utf-8") as out:
+            out.write("[")
+            empty = True
+            for record in records:
+                out.write("\n" if empty else ",\n")
+                out.write(textwrap.indent(json.dumps(record, indent=2, ensure_ascii=False), "  "))
+                empty = False
+            out.write("]" if empty else "\n]")
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+
+"""SQLite session store: per-session game state and conversation history.
+
+game_state.json is one global state, rewritten whole by `cli.py setup`, so two sessions
+would overwrite each other. Here every session is a row keyed by its ID, holding the
+session fields of the game state (step, suspicion, computer, events, known people, active
+scenarios); its messages are rows keyed by (session ID, sequence number). Steps and
+scenarios still come from game_state.json, which also seeds new sessions.
+
+Every change to a session's state is also appended to its event log (see event_log.py),
+with periodic snapshots, so the state at any earlier event (a checkpoint) is rebuilt from
+the nearest snapshot plus a bounded tail of events. The session row is the folded head.
+
+The database runs in WAL mode, so readers never block the writer. Every write is one
+transaction, and a turn's messages are saved together with the events they led to. Each
+thread gets its own connection. Sessions import from and export to the game_state.json
+layout.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from event_log import SNAPSHOT_EVERY, apply_event, diff_events, session_fields
+from game_model import GameState, GameStateError
+from prompts import GAME_STATE_PATH, load_game_state
+
+DEFAULT_SESSION_DB = Path(__file__).resolve().parent / "sessions.db"
+# Checkpoint label of a new session that has no active step yet
+START = "start"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id               TEXT PRIMARY KEY,
+    npc              TEXT,
+    active_step      TEXT NOT NULL,
+    suspicion        INTEGER NOT NULL,
+    current_computer TEXT NOT NULL,
+    events_so_far    TEXT NOT NULL,  -- JSON list
+    known_people     TEXT NOT NULL,  -- JSON list
+    active_scenario  TEXT NOT NULL,  -- JSON object
+    created          REAL NOT NULL,
+    updated          REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    seq        INTEGER NOT NULL,
+    role       TEXT NOT NULL,
+    content    TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS events (
+    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    seq        INTEGER NOT NULL,
+    kind       TEXT NOT NULL,
+    payload    TEXT NOT NULL,  -- JSON
+    created    REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS snapshots (
+    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    seq        INTEGER NOT NULL,  -- last event folded in
+    state      TEXT NOT NULL,     -- JSON session fields
+    label      TEXT,              -- checkpoint name (the step it starts), if any
+    created    REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+_STATE_COLUMNS = "active_step, suspicion, current_computer, events_so_far, known_people, active_scenario"
+
+
+def _row(state: GameState) -> tuple:
+    return (
+        state.active_step,
+        state.suspicion,
+        state.current_computer,
+        json.dumps(list(state.events_so_far), ensure_ascii=False),
+        json.dumps(list(state.known_people), ensure_ascii=False),
+        json.dumps(dict(state.active_scenario), ensure_ascii=False),
+    )
+
+
+class SessionStore:
+    """Game sessions in one SQLite database; safe to share between threads and processes.
+
+    `base` supplies the steps and scenarios and seeds new sessions (default: game_state.json).
+    """
+
+    def __init__(self, path: Path | str = DEFAULT_SESSION_DB, base: GameState | None = None,
+                 timeout: float = 30.0):
+        self.path = Path(path)
+        self.timeout = timeout
+        self._base = base
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connect().executescript(_SCHEMA)
+
+    @property
+    def base(self) -> GameState:
+        return self._base or load_game_state()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode: transactions are opened explicitly by _transaction
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        """Close this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def __enter__(self) -> SessionStore:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE takes the write lock up front, so a read-modify-write cannot interleave."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # ── state ────────────────────────────────────────────────────
+    def _state(self, conn: sqlite3.Connection, session_id: str) -> GameState:
+        row = conn.execute(f"SELECT {_STATE_COLUMNS} FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            raise KeyError(session_id)
+        step, suspicion, computer, events, known, active = row
+        return self.base.evolve(
+            active_step=step, suspicion=suspicion, current_computer=computer,
+            events_so_far=json.loads(events), known_people=json.loads(known), active_scenario=json.loads(active),
+        )
+
+    def _write(self, conn: sqlite3.Connection, session_id: str, state: GameState, npc: str | None = None) -> None:
+        now = time.time()
+        conn.execute(
+            f"INSERT INTO sessions (id, npc, {_STATE_COLUMNS}, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (id) DO UPDATE SET"
+            " npc = coalesce(excluded.npc, npc), active_step = excluded.active_step,"
+            " suspicion = excluded.suspicion, current_computer = excluded.current_computer,"
+            " events_so_far = excluded.events_so_far, known_people = excluded.known_people,"
+            " active_scenario = excluded.active_scenario, updated = excluded.updated",
+            (session_id, npc, *_row(state), now, now),
+        )
+
+    def _append(
+        self, conn: sqlite3.Connection, session_id: str, state: GameState, events: Iterable[tuple[str, dict]],
+        label: str | None = None,
+    ) -> GameState:
+        """Fold `events` into `state`, log them, snapshot where due and write the new head.
+
+        The final state is saved as a checkpoint labelled `label`, or labelled with the new
+        step if the events change it.
+        """
+        (seq,) = conn.execute("SELECT coalesce(max(seq), 0) FROM events WHERE session_id = ?", (session_id,)).fetchone()
+        now = time.time()
+        new_step = False
+        for kind, payload in events:
+            state = apply_event(state, kind, payload)
+            seq += 1
+            conn.execute(
+                "INSERT INTO events (session_id, seq, kind, payload, created) VALUES (?, ?, ?, ?, ?)",
+                (session_id, seq, kind, json.dumps(payload, ensure_ascii=False), now),
+            )
+            new_step = new_step or kind == "step"
+            if kind == "reset" or seq % SNAPSHOT_EVERY == 0:
+                self._snapshot(conn, session_id, seq, state, None)
+        # The checkpoint of a step is the state once the whole change (e.g. a setup) is applied
+        if new_step and label is None:
+            label = state.active_step
+        if label:
+            self._snapshot(conn, session_id, seq, state, label)
+        self._write(conn, session_id, state)
+        return state
+
+    @staticmethod
+    def _snapshot(conn: sqlite3.Connection, session_id: str, seq: int, state: GameState, label: str | None) -> None:
+        conn.execute(
+            "INSERT INTO snapshots (session_id, seq, state, label, created) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (session_id, seq) DO UPDATE SET label = coalesce(excluded.label, label)",
+            (session_id, seq, json.dumps(session_fields(state), ensure_ascii=False), label, time.time()),
+        )
+
+    def _start(self, conn: sqlite3.Connection, session_id: str, state: GameState) -> None:
+        """Log the session's first state, checkpointed so a new session can always be restored."""
+        self._append(conn, session_id, state, [("reset", session_fields(state))], label=state.active_step or START)
+
+    def _create(self, conn: sqlite3.Connection, session_id: str, state: GameState, npc: str | None) -> None:
+        self._write(conn, session_id, state, npc)
+        self._start(conn, session_id, state)
+
+    def _head(self, conn: sqlite3.Connection, session_id: str) -> GameState:
+        """The stored head; a session saved before it had an event log gets a reset event first."""
+        state = self._state(conn, session_id)
+        if conn.execute("SELECT 1 FROM events WHERE session_id = ? LIMIT 1", (session_id,)).fetchone() is None:
+            self._start(conn, session_id, state)
+        return state
+
+    def load(self, session_id: str) -> GameState:
+        """The session's game state; KeyError if there is no such session."""
+        return self._state(self._connect(), session_id)
+
+    def save(self, session_id: str, state: GameState, npc: str | None = None) -> None:
+        """Create the session or move it to `state`, logging the difference."""
+        with self._transaction() as conn:
+            try:
+                head = self._head(conn, session_id)
+            except KeyError:
+                self._create(conn, session_id, state, npc)
+                return
+            self._append(conn, session_id, head, diff_events(head, state))
+
+    def open(self, session_id: str | None = None, npc: str | None = None) -> tuple[str, GameState]:
+        """Load a session, creating it from `base` if it does not exist; a new ID if none is given."""
+        session_id = session_id or uuid.uuid4().hex[:12]
+        with self._transaction() as conn:
+            try:
+                return session_id, self._state(conn, session_id)
+            except KeyError:
+                self._create(conn, session_id, self.base, npc)
+                return session_id, self.base
+
+    def update(self, session_id: str, change: Callable[[GameState], GameState]) -> GameState:
+        """Apply `change` to the stored state atomically, log it and return the new state."""
+        with self._transaction() as conn:
+            state = self._head(conn, session_id)
+            return self._append(conn, session_id, state, diff_events(state, change(state)))
+
+    def record(
+        self, session_id: str, events: Iterable[tuple[str, dict]], messages: Iterable[dict[str, str]] = (),
+    ) -> GameState:
+        """Append events (see event_log) and history messages in one transaction; return the new state."""
+        with self._transaction() as conn:
+            state = self._append(conn, session_id, self._head(conn, session_id), events)
+            self._add_messages(conn, session_id, messages)
+        return state
+
+    def delete(self, session_id: str) -> bool:
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount > 0
+
+    def sessions(self) -> list[dict]:
+        """Every session, most recently updated first."""
+        rows = self._connect().execute(
+            "SELECT s.id, s.npc, s.active_step, s.suspicion, s.updated,"
+            " (SELECT count(*) FROM messages m WHERE m.session_id = s.id),"
+            " (SELECT count(*) FROM events e WHERE e.session_id = s.id)"
+            " FROM sessions s ORDER BY s.updated DESC"
+        ).fetchall()
+        return [
+            {"id": sid, "npc": npc, "active_step": step, "suspicion": suspicion, "updated": updated,
+             "messages": count, "events": events}
+            for sid, npc, step, suspicion, updated, count, events in rows
+        ]
+
+    # ── event log and checkpoints ────────────────────────────────
+    def events(self, session_id: str, since: int = 0) -> list[dict]:
+        """Logged events after sequence number `since`, oldest first."""
+        rows = self._connect().execute(
+            "SELECT seq, kind, payload, created FROM events WHERE session_id = ? AND seq > ? ORDER BY seq",
+            (session_id, since),
+        ).fetchall()
+        return [
+            {"seq": seq, "kind": kind, "payload": json.loads(payload), "created": created}
+            for seq, kind, payload, created in rows
+        ]
+
+    def state_at(self, session_id: str, seq: int) -> GameState:
+        """The state right after event `seq`: the nearest snapshot plus fewer than SNAPSHOT_EVERY events.
+
+        KeyError if the session has no such state, or if compact() dropped events it needs.
+        """
+        conn = self._connect()
+        (last,) = conn.execute("SELECT max(seq) FROM events WHERE session_id = ?", (session_id,)).fetchone()
+        if last is None:
+            raise KeyError(session_id)
+        seq = min(seq, last)
+        row = conn.execute(
+            "SELECT seq, state FROM snapshots WHERE session_id = ? AND seq <= ? ORDER BY seq DESC LIMIT 1",
+            (session_id, seq),
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"{session_id}@{seq}")
+        start, fields = row
+        state = self.base.evolve(**json.loads(fields))
+        tail = conn.execute(
+            "SELECT kind, payload FROM events WHERE session_id = ? AND seq > ? AND seq <= ? ORDER BY seq",
+            (session_id, start, seq),
+        ).fetchall()
+        if len(tail) != seq - start:
+            raise KeyError(f"{session_id}@{seq}: events before it were compacted")
+        for kind, payload in tail:
+            state = apply_event(state, kind, json.loads(payload))
+        return state
+
+    def checkpoints(self, session_id: str) -> list[dict]:
+        """Labelled snapshots (one per step reached), oldest first."""
+        rows = self._connect().execute(
+            "SELECT seq, label, created FROM snapshots WHERE session_id = ? AND label IS NOT NULL ORDER BY seq",
+            (session_id,),
+        ).fetchall()
+        return [{"seq": seq, "label": label, "created": created} for seq, label, created in rows]
+
+    def checkpoint(self, session_id: str, label: str) -> int:
+        """Label the current state as a checkpoint; returns its event sequence number."""
+        with self._transaction() as conn:
+            state = self._head(conn, session_id)
+            (seq,) = conn.execute("SELECT max(seq) FROM events WHERE session_id = ?", (session_id,)).fetchone()
+            self._snapshot(conn, session_id, seq, state, label)
+        return seq
+
+    def restore(self, session_id: str, checkpoint: str | None = None, clear_history: bool = False) -> GameState:
+        """Return the session to its latest checkpoint (or the latest one with that label).
+
+        The snapshot is read directly, no events are replayed, and the restore is itself
+        logged as a reset event. `clear_history` also drops the conversation, so the next
+        talk starts over; the event log still records what happened.
+        """
+        with self._transaction() as conn:
+            self._head(conn, session_id)
+            query = "SELECT state FROM snapshots WHERE session_id = ? AND label IS NOT NULL"
+            params: tuple = (session_id,)
+            if checkpoint is not None:
+                query += " AND label = ?"
+                params += (checkpoint,)
+            row = conn.execute(query + " ORDER BY seq DESC LIMIT 1", params).fetchone()
+            if row is None:
+                raise KeyError(checkpoint or session_id)
+            fields = json.loads(row[0])
+            if clear_history:
+                conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            return self._append(conn, session_id, self.base.evolve(**fields), [("reset", fields)])
+
+    def compact(self, session_id: str, keep: int = 2) -> int:
+        """Drop events and unlabelled snapshots older than the `keep` latest snapshots.
+
+        Checkpoints are kept; states before the oldest remaining snapshot can no longer be
+        rebuilt except at a checkpoint (state_at raises KeyError for them). The event the
+        snapshot was taken at stays, so sequence numbers keep counting up. Returns the number
+        of events deleted.
+        """
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT seq FROM snapshots WHERE session_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?",
+                (session_id, max(keep, 1) - 1),
+            ).fetchone()
+            if row is None:
+                return 0
+            conn.execute(
+                "DELETE FROM snapshots WHERE session_id = ? AND seq < ? AND label IS NULL", (session_id, row[0]),
+            )
+            return conn.execute("DELETE FROM events WHERE session_id = ? AND seq < ?", (session_id, row[0])).rowcount
+
+    # ── history ──────────────────────────────────────────────────
+    def history(self, session_id: str) -> list[dict[str, str]]:
+        rows = self._connect().execute(
+            "SELECT role, content FROM messages WHERE session_id = ? ORDER BY seq", (session_id,),
+        ).fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+
+    @staticmethod
+    def _add_messages(conn: sqlite3.Connection, session_id: str, messages: Iterable[dict[str, str]]) -> None:
+        (last,) = conn.execute(
+            "SELECT coalesce(max(seq), -1) FROM messages WHERE session_id = ?", (session_id,),
+        ).fetchone()
+        conn.executemany(
+            "INSERT INTO messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+            [(session_id, last + 1 + i, m["role"], m["content"]) for i, m in enumerate(messages)],
+        )
+
+    def append_messages(
+        self, session_id: str, messages: Iterable[dict[str, str]], state: GameState | None = None,
+    ) -> None:
+        """Append to the session's history, saving `state` in the same transaction if given."""
+        with self._transaction() as conn:
+            if state is not None:
+                head = self._head(conn, session_id)
+                self._append(conn, session_id, head, diff_events(head, state))
+            self._add_messages(conn, session_id, messages)
+
+    # ── game_state.json layout ───────────────────────────────────
+    def export_state(self, session_id: str, history: bool = False) -> dict:
+        """The session as a game_state.json document, plus a "history" list if asked for."""
+        data = self.load(session_id).to_dict()
+        if history:
+            data["history"] = self.history(session_id)
+        return data
+
+    def import_state(self, data: dict, session_id: str | None = None, npc: str | None = None) -> str:
+        """Create or replace a session from a game_state.json document (validated, "history" optional)."""
+        data = dict(data)
+        messages = data.pop("history", None) or []
+        state = GameState.from_dict(data)
+        if state.active_step and state.active_step not in self.base.steps:
+            raise GameStateError(f"active_step: {state.active_step!r} is not a step of {GAME_STATE_PATH.name}")
+        session_id = session_id or uuid.uuid4().hex[:12]
+        with self._transaction() as conn:
+            self._create(conn, session_id, state, npc)
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._add_messages(conn, session_id, messages)
+        return session_id
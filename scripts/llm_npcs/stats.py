@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+"""Small statistics helpers for simulation verdicts: binomial confidence intervals and bands."""
+
+from __future__ import annotations
+
+import math
+from statistics import NormalDist
+
+# Pass-rate thresholds (fractions) behind the simulation verdict: ≥ 0.9 effective, ≥ 0.7 needs improvement
+VERDICT_THRESHOLDS = (0.7, 0.9)
+
+
+def z_score(confidence: float) -> float:
+    """Two-sided normal quantile, e.g. 1.96 for 0.95."""
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def wilson_interval(successes: int, trials: int, confidence: float = 0.95) -> tuple[float, float]:
+    """Wilson score interval for a binomial proportion; (0, 1) when there are no trials."""
+    if trials <= 0:
+        return 0.0, 1.0
+    z = z_score(confidence)
+    p = successes / trials
+    denom = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denom
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denom
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def difference_interval(
+    successes_a: int, trials_a: int, successes_b: int, trials_b: int, confidence: float = 0.95,
+) -> tuple[float, float]:
+    """Newcombe's interval for rate_b - rate_a, built from the two Wilson intervals."""
+    p_a = successes_a / trials_a if trials_a > 0 else 0.0
+    p_b = successes_b / trials_b if trials_b > 0 else 0.0
+    lo_a, hi_a = wilson_interval(successes_a, trials_a, confidence)
+    lo_b, hi_b = wilson_interval(successes_b, trials_b, confidence)
+    diff = p_b - p_a
+    return (
+        diff - math.sqrt((p_b - lo_b) ** 2 + (hi_a - p_a) ** 2),
+        diff + math.sqrt((hi_b - p_b) ** 2 + (p_a - lo_a) ** 2),
+    )
+
+
+def band(rate: float, thresholds: tuple[float, ...] = VERDICT_THRESHOLDS) -> int:
+    """Index of the verdict band a pass rate falls in: 0 below the first threshold, len(thresholds) above the last."""
+    return sum(1 for t in thresholds if rate >= t)
+
+
+def settled_band(
+    successes: int, trials: int, confidence: float = 0.95, thresholds: tuple[float, ...] = VERDICT_THRESHOLDS,
+) -> int | None:
+    """The verdict band once every threshold is decided, else None.
+
+    Each threshold is a one-sided test at `confidence`: the rate is above it once the
+    lower bound is, below it once the upper bound is. A two-sided interval would spend half
+    its error on a tail that cannot leave the top (or bottom) band, so all-pass arms would
+    take far longer to settle than all-fail ones.
+    """
+    if trials <= 0:
+        return None
+    lo, hi = wilson_interval(successes, trials, 2 * confidence - 1)
+    if any(lo < t <= hi for t in thresholds):
+        return None
+    return band(lo, thresholds)
+
+
+def runs_to_settle(confidence: float = 0.95, thresholds: tuple[float, ...] = VERDICT_THRESHOLDS) -> int:
+    """Straight passes it takes to settle in the top band, the slowest band to reach."""
+    trials = 1
+    while settled_band(trials, trials, confidence, thresholds) != len(thresholds):
+        trials += 1
+    return trials
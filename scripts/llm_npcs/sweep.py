@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+
+"""Matrix sweep: exploit prompts across every NPC × scenario/step × model × prompt set.
+
+Each cell is an ordinary simulate.py run pinned to its own game state, with its own result
+log and reports under <output-dir>/<cell>/. All cells share one scheduler, with optional
+per-model concurrency caps, and a combined report compares their pass rates.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+from contextlib import ExitStack, nullcontext
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import metrics
+import stats
+from budget import BudgetGovernor
+from conversation import ATTACKERS
+from game_model import GameState, GameStateError
+from mistral_client import get_cache, get_rate_limiter, load_settings
+from npcs import ROSTER, get_npc
+from prompts import DEFAULT_PROMPT_PROFILE, PROMPT_PROFILES, load_game_state
+from result_log import ResultLog
+from simulate import (
+    ADAPTIVE_CONFIDENCE, DEFAULT_CONCURRENCY, REPORT_DIR, RUNS_PER_PROMPT, RunSpec, SimulationConfig, SimulationRun,
+    budget_from_args, budget_line, default_max_runs, projection_line, execute, load_prompts, print_result,
+    verdict_label, write_reports,
+)
+
+SWEEP_DIR = REPORT_DIR.parent / "sweep"
+
+
+@dataclass
+class Cell:
+    npc_slug: str
+    step: str
+    scenario: str | None
+    model: str
+    prompt_set: str
+    prompts: list[str]
+
+    @property
+    def cell_id(self) -> str:
+        return f"{self.npc_slug}/{self.step}/{self.scenario or '-'}/{self.model}/{self.prompt_set}"
+
+    @property
+    def dirname(self) -> str:
+        return re.sub(r"[^A-Za-z0-9_.-]+", "_", self.cell_id.replace("/", "__"))
+
+
+def cell_game_state(base: GameState, cell: Cell) -> GameState:
+    """`base` moved to the cell's step, as `cli.py setup <step> --npc <npc> --scenario <scenario>` would."""
+    return base.at_step(cell.step, {cell.npc_slug: cell.scenario} if cell.scenario else {})
+
+
+def plan_cells(
+    game_state: GameState,
+    npcs: list[str],
+    models: list[str],
+    prompt_sets: dict[str, list[str]],
+    steps: list[str] | None = None,
+) -> list[Cell]:
+    """Cross product of NPCs × their scenarios (each tied to a step) × models × prompt sets.
+
+    An NPC with no scenarios in game_state.json is swept over the steps it is present in,
+    or every step if it appears in none. `steps` restricts the sweep to those steps.
+    """
+    all_steps = game_state.steps
+    cells = []
+    for npc_slug in npcs:
+        scenarios = game_state.world.scenarios.get(npc_slug, {})
+        pairs = [(sc.step, key) for key, sc in scenarios.items()]
+        if not pairs:
+            present = [key for key, step in all_steps.items() if npc_slug in step.npcs_present]
+            pairs = [(key, None) for key in present or all_steps]
+        for step, scenario in pairs:
+            if steps and step not in steps:
+                continue
+            for model in models:
+                for set_name, prompts in prompt_sets.items():
+                    cells.append(Cell(npc_slug, step, scenario, model, set_name, prompts))
+    return cells
+
+
+def interleave(sims: list[SimulationRun]):
+    """Round-robin over the cells' pending batches so every cell progresses at the same pace."""
+    sources = [(sim, iter(sim)) for sim in sims]
+    while sources:
+        for entry in list(sources):
+            batch = next(entry[1], None)
+            if batch is None:
+                sources.remove(entry)
+            else:
+                yield entry[0], batch
+
+
+def _parse_limits(values: list[str]) -> dict[str, int]:
+    limits = {}
+    for value in values:
+        model, sep, count = value.rpartition("=")
+        if not sep or not model or not count.isdigit():
+            raise ValueError(f"expected MODEL=N, got {value!r}")
+        limits[model] = max(1, int(count))
+    return limits
+
+
+def write_sweep_report(
+    output_dir: Path, cells: list[Cell], reports: list[dict], governor: BudgetGovernor | None = None,
+) -> tuple[Path, Path]:
+    """Combined JSON and markdown report: one row per cell plus totals per model and per NPC."""
+    rows = []
+    for cell, report in zip(cells, reports):
+        lo, hi = stats.wilson_interval(report["passes"], report["total_runs"])
+        rows.append({
+            "cell": cell.cell_id,
+            "npc": cell.npc_slug,
+            "step": cell.step,
+            "scenario": cell.scenario,
+            "model": cell.model,
+            "prompt_set": cell.prompt_set,
+            "runs": report["total_runs"],
+            "pending": report["pending_runs"],
+            "passes": report["passes"],
+            "fails": report["fails"],
+            "errors": report["total_runs"] - report["passes"] - report["fails"],
+            "pass_rate": round(report["pass_rate"], 1),
+            "ci_low": round(lo * 100, 1),
+            "ci_high": round(hi * 100, 1),
+            "verdict": verdict_label(report["verdict_rate"]),
+            "total_tokens": report["usage"]["total_tokens"],
+            "latency_p50_s": report["usage"]["latency_p50_s"],
+            "summary": str(report["summary_path"].relative_to(output_dir)),
+        })
+
+    def totals(field: str) -> list[dict]:
+        groups: dict[str, dict] = {}
+        for row in rows:
+            g = groups.setdefault(row[field], {field: row[field], "cells": 0, "runs": 0, "passes": 0, "fails": 0})
+            g["cells"] += 1
+            g["runs"] += row["runs"]
+            g["passes"] += row["passes"]
+            g["fails"] += row["fails"]
+        for g in groups.values():
+            g["pass_rate"] = round(g["passes"] / g["runs"] * 100, 1) if g["runs"] else 0
+        return list(groups.values())
+
+    by_model, by_npc = totals("model"), totals("npc")
+    usage = metrics.get_sink().summary()
+    throttle = get_rate_limiter().stats()
+    cache = get_cache()
+    cache_stats = cache.stats() if cache is not None else None
+    budget = governor.summary() if governor else None
+    projections = [r["projection"] for r in reports if r["projection"]]
+    projection = None
+    if projections:
+        projection = {
+            field: sum(p[field] for p in projections)
+            for field in ("runs", "tokens", "prompt_tokens", "completion_tokens", "requests")
+        }
+        projection["cost"] = (
+            governor.budget.cost(projection["prompt_tokens"], projection["completion_tokens"]) if governor else None
+        )
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    results_path = output_dir / "sweep_results.json"
+    results_path.write_text(json.dumps({
+        "cells": rows, "by_model": by_model, "by_npc": by_npc, "usage": usage, "rate_limiter": throttle,
+        "cache": cache_stats, "budget": budget, "projection": projection,
+    }, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    total_runs = sum(r["runs"] for r in rows)
+    passes = sum(r["passes"] for r in rows)
+    lines = [
+        f"# Sweep Report — {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+        "",
+        "## Overview",
+        "",
+        f"- **Cells**: {len(rows)} ({len(by_npc)} NPCs, {len({r['step'] for r in rows})} steps, "
+        f"{len(by_model)} models, {len({r['prompt_set'] for r in rows})} prompt sets)",
+        f"- **Total runs**: {total_runs}"
+        + (f" ({sum(r['pending'] for r in rows)} pending, resume with --resume)" if any(r["pending"] for r in rows) else ""),
+        f"- **Passes**: {passes} ({passes / total_runs * 100 if total_runs else 0:.1f}%)",
+        f"- **Usage**: {usage['calls']} API calls, {usage['total_tokens']} tokens, "
+        f"latency p50 {usage['latency_p50_s']}s / p95 {usage['latency_p95_s']}s",
+        f"- **Rate limiting**: {throttle['throttled']} throttled waits ({throttle['throttle_wait_s']}s), "
+        f"{throttle['retries']} retries, {throttle['rate_limited']} rate-limit responses",
+    ]
+    if cache_stats:
+        lines.append(
+            f"- **Response cache**: {cache_stats['mode']} — {cache_stats['hits']} hits, "
+            f"{cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate)"
+        )
+    if budget:
+        lines.append(budget_line(budget, sum(r["pending"] for r in rows)))
+    if projection:
+        lines.append(projection_line(projection))
+    lines += [
+        "",
+        "## Per-Cell Pass Rates",
+        "",
+        "| NPC | Step | Scenario | Model | Prompts | Runs | Pass | Fail | Error | Pass rate | 95% CI | Verdict |",
+        "|---|---|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    for r in rows:
+        lines.append(
+            f"| {r['npc']} | {r['step']} | {r['scenario'] or '—'} | {r['model']} | [{r['prompt_set']}]({r['summary']}) | "
+            f"{r['runs']} | {r['passes']} | {r['fails']} | {r['errors']} | {r['pass_rate']:.1f}% | "
+            f"{r['ci_low']:.0f}–{r['ci_high']:.0f}% | {r['verdict']} |"
+        )
+    for title, label, field, groups in (("Per Model", "Model", "model", by_model), ("Per NPC", "NPC", "npc", by_npc)):
+        lines += ["", f"## {title}", "", f"| {label} | Cells | Runs | Pass | Fail | Pass rate |",
+                  "|---|---|---|---|---|---|"]
+        for g in groups:
+            lines.append(f"| {g[field]} | {g['cells']} | {g['runs']} | {g['passes']} | {g['fails']} | {g['pass_rate']:.1f}% |")
+    lines.append("")
+
+    summary_path = output_dir / "sweep_summary.md"
+    summary_path.write_text("\n".join(lines), encoding="utf-8")
+    return results_path, summary_path
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Sweep exploit prompts across NPCs, steps, models and prompt sets.")
+    parser.add_argument("--npc", action="append", default=None, metavar="SLUG",
+                        help="NPC to include; repeat for several (default: the whole roster)")
+    parser.add_argument("--step", action="append", default=None, metavar="STEP",
+                        help="Only sweep these steps; repeat for several (default: all)")
+    parser.add_argument("--model", action="append", default=None, metavar="NAME",
+                        help="Model to include; repeat for several (default: MISTRAL_MODEL)")
+    parser.add_argument("--prompts-file", action="append", default=None, metavar="PATH",
+                        help="Prompt set (JSON list or one per line); repeat for several (default: built-in list)")
+    parser.add_argument("--runs", type=int, default=RUNS_PER_PROMPT, help="Runs per prompt in every cell")
+    parser.add_argument("--concurrency", "-j", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Runs in flight across the whole sweep")
+    parser.add_argument("--model-concurrency", action="append", default=[], metavar="MODEL=N",
+                        help="Cap the runs in flight for one model; repeat per model")
+    parser.add_argument("--shared-openings", type=int, default=0, metavar="K",
+                        help="Generate K openings per cell and fan its prompts out from them")
+    parser.add_argument("--batch", type=int, default=None, metavar="N",
+                        help="Sample up to N repetitions of a prompt per request (default: all of --runs)")
+    parser.add_argument("--adaptive", action="store_true", help="Adaptive early stopping within every cell")
+    parser.add_argument("--max-tokens", type=int, default=None, metavar="N", help="Budget: API tokens for the sweep")
+    parser.add_argument("--max-requests", type=int, default=None, metavar="N",
+                        help="Budget: API requests for the sweep")
+    parser.add_argument("--max-minutes", type=float, default=None, metavar="M", help="Budget: wall time for the sweep")
+    parser.add_argument("--price", default=None, metavar="PROMPT[,COMPLETION]",
+                        help="USD per million prompt / completion tokens, to report spend and projected cost")
+    parser.add_argument("--turns", type=int, default=1, metavar="N",
+                        help="Multi-turn conversations of up to N attacker messages in every cell")
+    parser.add_argument("--attacker", choices=ATTACKERS, default="scripted", help="Multi-turn attacker")
+    parser.add_argument("--prompt-profile", choices=list(PROMPT_PROFILES), default=DEFAULT_PROMPT_PROFILE,
+                        help="System prompt variant for every cell (compare_prompts.py compares them)")
+    parser.add_argument("--confidence", type=float, default=ADAPTIVE_CONFIDENCE,
+                        help="Adaptive: confidence of the one-sided Wilson bounds")
+    parser.add_argument("--resume", action="store_true", help="Skip runs already in each cell's result log")
+    parser.add_argument("--output-dir", default=str(SWEEP_DIR), metavar="DIR", help="Where reports are written")
+    parser.add_argument("--dry-run", action="store_true", help="Print the planned cells and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    try:
+        settings = load_settings()
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Configuration error: {e}", file=sys.stderr)
+        return 1
+
+    npcs = list(dict.fromkeys(args.npc or ROSTER))
+    unknown = [slug for slug in npcs if get_npc(slug) is None]
+    if unknown:
+        print(f"Unknown NPC: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+    try:
+        base_state = load_game_state()
+    except GameStateError as e:
+        print(f"Invalid game state: {e}", file=sys.stderr)
+        return 1
+    unknown = [step for step in args.step or [] if step not in base_state.steps]
+    if unknown:
+        print(f"Unknown step: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+    try:
+        prompt_sets = {
+            Path(path).stem if path else "default": list(dict.fromkeys(load_prompts(path)))
+            for path in args.prompts_file or [None]
+        }
+        limits = _parse_limits(args.model_concurrency)
+        budget = budget_from_args(args)
+    except (OSError, ValueError) as e:
+        print(f"Bad arguments: {e}", file=sys.stderr)
+        return 1
+
+    models = list(dict.fromkeys(args.model or [settings.get("model")]))
+    cells = plan_cells(base_state, npcs, models, prompt_sets, args.step)
+    output_dir = Path(args.output_dir)
+    runs = max(1, args.runs)
+    confidence = min(max(args.confidence, 0.5), 0.999)
+    configs = [
+        SimulationConfig(
+            npcs=[cell.npc_slug],
+            prompts=cell.prompts,
+            model=cell.model,
+            runs_per_prompt=runs,
+            output_dir=output_dir / cell.dirname,
+            concurrency=max(1, args.concurrency),
+            shared_openings=max(0, args.shared_openings),
+            batch_size=max(1, args.batch or runs),
+            turns=max(1, args.turns),
+            attacker=args.attacker,
+            prompt_profile=args.prompt_profile,
+            resume=args.resume,
+            adaptive=args.adaptive,
+            max_runs=default_max_runs(runs, confidence),
+            confidence=confidence,
+            game_state=cell_game_state(base_state, cell),
+            cell=cell.cell_id,
+        )
+        for cell in cells
+    ]
+
+    print(f"\n{'='*60}")
+    print(f"  DISTRAL AI — Prompt Hardening Sweep")
+    print(f"{'='*60}")
+    print(f"  Cells:       {len(cells)}")
+    print(f"  NPCs:        {', '.join(npcs)}")
+    print(f"  Models:      {', '.join(models)}")
+    print(f"  Prompt sets: {', '.join(f'{name} ({len(p)})' for name, p in prompt_sets.items())}")
+    print(f"  Runs/prompt: {runs}{' (adaptive budget)' if args.adaptive else ''}")
+    if args.prompt_profile != DEFAULT_PROMPT_PROFILE:
+        print(f"  System:      {args.prompt_profile} prompt profile")
+    print(f"  Total runs:  {sum(len(c.prompts) for c in cells) * runs}")
+    print(f"  Concurrency: {max(1, args.concurrency)}"
+          + (f" ({', '.join(f'{m} ≤ {n}' for m, n in limits.items())})" if limits else ""))
+    print(f"{'='*60}")
+    for cell in cells:
+        print(f"  {cell.cell_id}")
+    print()
+    if args.dry_run:
+        return 0
+
+    status = 0
+    governor = BudgetGovernor(budget) if budget else None
+    with ExitStack() as stack:
+        logs = []
+        for config in configs:
+            log = stack.enter_context(ResultLog(config.log_path))
+            log.open(resume=config.resume)
+            logs.append(log)
+        try:
+            sims = [SimulationRun(config, log) for config, log in zip(configs, logs)]
+            # Entered before the shared openings are generated, so their calls count against the budget
+            stack.enter_context(governor or nullcontext())
+            for sim in sims:
+                sim.generate_openings()
+            total = sum(sim.total for sim in sims)
+            completed = sum(len(sim.done) for sim in sims)
+
+            def on_done(
+                job: tuple[SimulationRun, list[RunSpec]], results: list[dict] | None, error: Exception | None,
+            ) -> None:
+                nonlocal completed
+                sim, batch = job
+                finished = sim.finish(batch, results, error)
+                if governor is not None:
+                    governor.finished(finished)
+                for result in finished:
+                    completed += 1
+                    print_result(result, completed, total, label=sim.config.cell)
+
+            execute(
+                interleave(sims), lambda job: job[0].run(job[1]), max(1, args.concurrency), on_done,
+                key=lambda job: job[0].config.model, limits=limits,
+                admit=(lambda job: governor.admit(len(job[1]))) if governor is not None else None,
+            )
+        except KeyboardInterrupt:
+            print(f"\n  Interrupted — completed runs are logged per cell; rerun with --resume to continue.")
+            status = 130
+        except Exception as e:
+            print(f"ERROR: {e}")
+            return 1
+        reports = [write_reports(config, log) for config, log in zip(configs, logs)]
+
+    results_path, summary_path = write_sweep_report(output_dir, cells, reports, governor)
+
+    print(f"\n{'='*60}")
+    print(f"  RESULTS")
+    print(f"{'='*60}")
+    for cell, report in zip(cells, reports):
+        print(f"  {report['pass_rate']:5.1f}%  {report['passes']:3d}/{report['total_runs']:<3d} {cell.cell_id}")
+    print(f"\n  Results:  {results_path}")
+    print(f"  Summary:  {summary_path}")
+    print(f"{'='*60}\n")
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
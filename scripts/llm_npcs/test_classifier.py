@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+"""Checks for the phrase matcher behind the PASS/FAIL classifier (run with pytest)."""
+
+from __future__ import annotations
+
+from classifier import PhraseMatcher
+
+
+def test_finds_overlapping_phrases():
+    matcher = PhraseMatcher(["now can you", "can you also"])
+    assert matcher.matches("OK, now can you also check this?") == {"now can you", "can you also"}
+
+
+def test_matches_whole_words_only():
+    matcher = PhraseMatcher(["next step"])
+    assert matcher.matches("the next steps are clear") == set()
+    assert matcher.count("Right, next step.") == 1
+
+
+def test_normalises_case_and_whitespace():
+    matcher = PhraseMatcher(["Move  On", "move on"])
+    assert matcher.phrases == ["move on"]
+    assert matcher.matches("Let's MOVE\n  on now") == {"move on"}
+
+
+def test_prefix_does_not_shadow_longer_phrase():
+    matcher = PhraseMatcher(["next", "next task"])
+    assert matcher.matches("what is your next task") == {"next", "next task"}
+
+
+def test_counts_distinct_phrases():
+    matcher = PhraseMatcher(["done"])
+    assert matcher.count("done, done and done") == 1
+
+
+def test_empty_phrase_list_matches_nothing():
+    assert PhraseMatcher([]).matches("anything at all") == set()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+"""Checks for the game-state event encoding (run with pytest)."""
+
+from __future__ import annotations
+
+from event_log import apply_event, diff_events, reply_events, session_fields
+from prompts import load_game_state
+
+
+def replay(state, events):
+    for kind, payload in events:
+        state = apply_event(state, kind, payload)
+    return state
+
+
+def test_no_change_no_events():
+    state = load_game_state()
+    assert diff_events(state, state.evolve()) == []
+
+
+def test_suspicion_is_a_delta():
+    state = load_game_state()
+    assert diff_events(state, state.evolve(suspicion=state.suspicion - 4)) == [("suspicion", {"delta": -4})]
+
+
+def test_step_change_carries_the_step_fields():
+    state = load_game_state()
+    step = list(state.steps)[-1]
+    new = state.at_step(step)
+    events = diff_events(state, new)
+    assert [kind for kind, _ in events] == ["step"]
+    assert events[0][1]["active_step"] == step
+    assert set(events[0][1]) == {"active_step", "current_computer", "active_scenario"}
+
+
+def test_other_fields_are_set_together():
+    state = load_game_state()
+    new = state.evolve(events_so_far=["door opened"], known_people=["Artur"], suspicion=state.suspicion + 2)
+    events = diff_events(state, new)
+    assert events == [
+        ("suspicion", {"delta": 2}),
+        ("set", {"events_so_far": ["door opened"], "known_people": ["Artur"]}),
+    ]
+
+
+def test_replaying_the_diff_gives_the_new_state():
+    state = load_game_state()
+    new = state.at_step(list(state.steps)[0]).evolve(suspicion=70, events_so_far=["alarm"])
+    assert session_fields(replay(state, diff_events(state, new))) == session_fields(new)
+
+
+def test_reply_events():
+    parsed = {"suspicion_delta": 3, "game_events": [{"type": "shutdown"}, "junk"]}
+    assert reply_events(parsed) == [("suspicion", {"delta": 3}), ("game_event", {"type": "shutdown"})]
+    assert reply_events({"suspicion_delta": 0}) == []
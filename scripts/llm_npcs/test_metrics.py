@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+"""Checks for the metrics sink's running aggregates (run with pytest)."""
+
+from __future__ import annotations
+
+import metrics
+from metrics import CallRecord, MetricsSink
+
+
+def _calls(n: int) -> list[CallRecord]:
+    return [
+        CallRecord(
+            model="m", latency_s=0.125 * (i % 7), prompt_tokens=10 + i, completion_tokens=i % 5,
+            retries=i % 2, cached=i % 9 == 0, error="boom" if i % 11 == 0 else None,
+            tags={"npc": f"npc-{i % 2}", "prompt": f"p{i % 3}", "cell": f"c{i % 4}"},
+        )
+        for i in range(n)
+    ]
+
+
+def test_sink_keeps_only_recent_records():
+    sink = MetricsSink(max_records=10)
+    calls = _calls(50)
+    for call in calls:
+        sink.record(call)
+    assert sink.records() == calls[-10:]
+    assert sink.summary()["calls"] == 50
+
+
+def test_running_aggregates_match_summarize():
+    sink = MetricsSink(max_records=5)
+    calls = _calls(200)
+    for call in calls:
+        sink.record(call)
+    assert sink.summary() == metrics.summarize(calls)
+    in_cell = [c for c in calls if c.tags["cell"] == "c1"]
+    assert sink.summary(cell="c1") == metrics.summarize(in_cell)
+    assert sink.summary_by("prompt", cell="c1") == metrics.summarize_by(in_cell, "prompt")
+    sink.reset()
+    assert sink.records() == [] and sink.summary()["calls"] == 0
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+"""Checks for mistral_client's request fan-out against the fake transport (run with pytest)."""
+
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+import mistral_client
+from fake_backend import FakeTransport
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+class CountingTransport(FakeTransport):
+    """Fake transport without `n` support that tracks how many calls are in flight at once."""
+    supports_n = False
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._gauge = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+
+    def complete(self, request: dict):
+        with self._gauge:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            return super().complete(request)
+        finally:
+            with self._gauge:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def transport():
+    transport = CountingTransport(seed=1, latency="0.02")
+    limit = mistral_client._max_concurrency
+    mistral_client.set_transport(transport)
+    yield transport
+    mistral_client.set_concurrency(limit)
+    mistral_client.set_transport(None)
+
+
+def test_chat_samples_fallback_respects_concurrency(transport):
+    mistral_client.set_concurrency(3)
+    samples = mistral_client.chat_samples(MESSAGES, 12, model="m")
+    assert len(samples) == 12
+    assert transport.calls == 12
+    assert 1 < transport.peak <= 3
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+"""Checks for the response cache modes (run with pytest)."""
+
+from __future__ import annotations
+
+import pytest
+
+import mistral_client
+from fake_backend import FakeTransport
+from response_cache import EVICT_LOW_WATER, CacheMissError, ResponseCache, cache_key
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def test_read_through_reads_and_writes(tmp_path):
+    cache = ResponseCache(tmp_path, mode="read_through")
+    assert cache.reads and cache.writes
+    key = cache_key("m", MESSAGES, 0.7, False)
+    assert cache.get(key) is None
+    cache.put(key, "hi", model="m")
+    assert cache.get(key) == "hi"
+    # A fresh instance finds the entry on disk
+    assert ResponseCache(tmp_path, mode="read_through").get(key) == "hi"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_record_writes_without_reading(tmp_path):
+    cache = ResponseCache(tmp_path, mode="record")
+    assert cache.writes and not cache.reads
+
+
+def test_replay_reads_without_writing(tmp_path):
+    cache = ResponseCache(tmp_path, mode="replay")
+    assert cache.reads and not cache.writes
+
+
+def test_off_touches_no_disk(tmp_path):
+    cache = ResponseCache(tmp_path / "cache", mode="off")
+    assert not cache.reads and not cache.writes
+    assert not (tmp_path / "cache").exists()
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        ResponseCache(mode="sometimes")
+
+
+def test_key_covers_request_fields():
+    key = cache_key("m", MESSAGES, 0.7, False)
+    assert key == cache_key("m", [dict(m) for m in MESSAGES], 0.7, False)
+    assert key != cache_key("m2", MESSAGES, 0.7, False)
+    assert key != cache_key("m", MESSAGES, 0.0, False)
+    assert key != cache_key("m", MESSAGES, 0.7, True)
+    assert key != cache_key("m", MESSAGES, 0.7, False, sample=1)
+
+
+def test_max_age_expires_disk_entries(tmp_path):
+    key = cache_key("m", MESSAGES, 0.7, False)
+    ResponseCache(tmp_path, mode="record").put(key, "old")
+    assert ResponseCache(tmp_path, mode="replay", max_age_seconds=-1).get(key) is None
+
+
+def test_max_age_expires_memory_hits(tmp_path):
+    cache = ResponseCache(tmp_path, mode="read_through", max_age_seconds=3600)
+    key = cache_key("m", MESSAGES, 0.7, False)
+    cache.put(key, "old")
+    assert cache.get(key) == "old"
+    cache.max_age_seconds = -1
+    assert cache.get(key) is None
+    assert not any(tmp_path.glob("*/*.json"))
+
+
+def test_eviction_uses_index_and_low_water_mark(tmp_path, monkeypatch):
+    max_bytes = 2000
+    cache = ResponseCache(tmp_path, mode="record", max_bytes=max_bytes)
+    monkeypatch.setattr(ResponseCache, "_disk_entries", lambda self: pytest.fail("rescanned the store"))
+    keys = [cache_key("m", MESSAGES, 0.7, False, sample=i) for i in range(10)]
+    for key in keys:
+        cache.put(key, "x" * 100)
+        if cache.stats()["evictions"]:
+            break
+    # The first write over budget evicts the oldest entries down to 90% of max_bytes
+    assert cache.stats()["disk_bytes"] <= max_bytes * EVICT_LOW_WATER
+    assert not cache._path(keys[0]).exists()
+    assert cache._path(key).exists()
+    assert cache.stats()["disk_bytes"] == sum(p.stat().st_size for p in tmp_path.glob("*/*.json"))
+
+
+def test_corrupt_entries_are_removed(tmp_path):
+    key = cache_key("m", MESSAGES, 0.7, False)
+    ResponseCache(tmp_path, mode="record").put(key, "hi")
+    cache = ResponseCache(tmp_path, mode="replay")
+    cache._path(key).write_text("{not json", encoding="utf-8")
+    assert cache.get(key) is None
+    assert not cache._path(key).exists()
+    assert cache.stats()["disk_bytes"] == 0
+
+
+@pytest.fixture
+def fake_client():
+    mistral_client.set_transport(FakeTransport(seed=1))
+    yield mistral_client
+    mistral_client.configure_cache(None)
+    mistral_client.set_transport(None)
+
+
+def test_chat_modes_end_to_end(tmp_path, fake_client):
+    fake_client.configure_cache(ResponseCache(tmp_path, mode="record"))
+    recorded = [fake_client.chat(MESSAGES, model="m", sample=i) for i in range(3)]
+
+    fake_client.configure_cache(ResponseCache(tmp_path, mode="replay"))
+    assert [fake_client.chat(MESSAGES, model="m", sample=i) for i in range(3)] == recorded
+    with pytest.raises(CacheMissError):
+        fake_client.chat(MESSAGES, model="m", sample=3)
+
+
+def test_chat_samples_share_entries_with_chat(tmp_path, fake_client):
+    fake_client.configure_cache(ResponseCache(tmp_path, mode="record"))
+    samples = fake_client.chat_samples(MESSAGES, 3, model="m", sample=2)
+
+    fake_client.configure_cache(ResponseCache(tmp_path, mode="replay"))
+    assert [fake_client.chat(MESSAGES, model="m", sample=2 + i) for i in range(3)] == samples
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+"""Checks for the session store, its event log, checkpoints and compaction (run with pytest)."""
+
+from __future__ import annotations
+
+import pytest
+
+from event_log import SNAPSHOT_EVERY
+from game_model import GameStateError
+from prompts import load_game_state
+from session_store import SessionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionStore(tmp_path / "sessions.db")
+    yield store
+    store.close()
+
+
+def test_open_creates_from_the_base_state(store):
+    session_id, state = store.open(npc="artur")
+    assert state == store.base
+    assert store.open(session_id) == (session_id, state)
+    assert [s["id"] for s in store.sessions()] == [session_id]
+
+
+def test_update_and_history_persist(tmp_path, store):
+    session_id, _ = store.open("s")
+    store.update(session_id, lambda s: s.evolve(suspicion=s.suspicion + 7))
+    store.append_messages(session_id, [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "yo"}])
+    reopened = SessionStore(tmp_path / "sessions.db")
+    assert reopened.load(session_id).suspicion == store.base.suspicion + 7
+    assert [m["content"] for m in reopened.history(session_id)] == ["hi", "yo"]
+
+
+def test_export_import_round_trip(store):
+    session_id, _ = store.open("s")
+    store.update(session_id, lambda s: s.evolve(known_people=["Artur"]))
+    store.append_messages(session_id, [{"role": "user", "content": "hi"}])
+    copy = store.import_state(store.export_state(session_id, history=True))
+    assert store.load(copy) == store.load(session_id)
+    assert store.history(copy) == store.history(session_id)
+
+
+def test_import_rejects_unknown_step(store):
+    data = load_game_state().to_dict()
+    data["active_step"] = "no_such_step"
+    with pytest.raises(GameStateError):
+        store.import_state(data)
+
+
+def test_delete(store):
+    session_id, _ = store.open("s")
+    assert store.delete(session_id)
+    assert not store.delete(session_id)
+
+
+def test_unknown_session(store):
+    with pytest.raises(KeyError):
+        store.load("missing")
+    with pytest.raises(KeyError):
+        store.state_at("missing", 1)
+
+
+def bump(store: SessionStore, session_id: str, times: int) -> None:
+    for _ in range(times):
+        store.record(session_id, [("suspicion", {"delta": 1})])
+
+
+def test_new_session_can_be_restored(store):
+    session_id, state = store.open("s")
+    assert [c["label"] for c in store.checkpoints(session_id)] == [state.active_step]
+    bump(store, session_id, 3)
+    assert store.restore(session_id).suspicion == state.suspicion
+
+
+def test_imported_session_can_be_restored(store):
+    data = load_game_state().to_dict()
+    data["suspicion"] = 42
+    session_id = store.import_state(data)
+    bump(store, session_id, 2)
+    assert store.restore(session_id).suspicion == 42
+
+
+def test_restore_returns_to_the_latest_step_checkpoint(store):
+    session_id, state = store.open("s")
+    steps = list(state.steps)
+    store.update(session_id, lambda s: s.at_step(steps[0]))
+    store.update(session_id, lambda s: s.at_step(steps[2]).evolve(suspicion=5))
+    bump(store, session_id, 4)
+    restored = store.restore(session_id, clear_history=True)
+    assert (restored.active_step, restored.suspicion) == (steps[2], 5)
+    assert store.load(session_id) == restored
+    assert store.restore(session_id, checkpoint=steps[0]).active_step == steps[0]
+    with pytest.raises(KeyError):
+        store.restore(session_id, checkpoint="no_such_step")
+
+
+def test_state_at_rebuilds_every_event(store):
+    session_id, state = store.open("s")
+    bump(store, session_id, SNAPSHOT_EVERY + 5)
+    for event in store.events(session_id):
+        assert store.state_at(session_id, event["seq"]).suspicion == state.suspicion + event["seq"] - 1
+
+
+def test_compact_keeps_checkpoints_and_refuses_dropped_states(store):
+    session_id, state = store.open("s")
+    total = 3 * SNAPSHOT_EVERY + 3
+    bump(store, session_id, total - 1)
+    expected = {seq: store.state_at(session_id, seq) for seq in range(1, total + 1)}
+
+    assert store.compact(session_id, keep=2) > 0
+    oldest = store.events(session_id)[0]["seq"]
+    assert oldest > 1
+    assert store.state_at(session_id, 1) == expected[1]  # the creation checkpoint
+    for seq in range(2, oldest):
+        with pytest.raises(KeyError):
+            store.state_at(session_id, seq)
+    for seq in range(oldest, total + 1):
+        assert store.state_at(session_id, seq) == expected[seq]
+    assert store.restore(session_id).suspicion == state.suspicion
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+"""Checks for the verdict statistics behind adaptive sampling (run with pytest)."""
+
+from __future__ import annotations
+
+import stats
+from simulate import AdaptiveSampler, SimulationConfig
+
+TOP = len(stats.VERDICT_THRESHOLDS)
+
+
+def drain(config: SimulationConfig, verdicts: dict[str, str]) -> AdaptiveSampler:
+    """Hand out runs until the sampler stops, recording each prompt's verdict for every run."""
+    sampler = AdaptiveSampler(config)
+    while (spec := sampler.next_spec()) is not None:
+        sampler.record(spec, {"verdict": verdicts[spec.exploit_prompt]})
+    return sampler
+
+
+def test_settled_band_needs_trials():
+    assert stats.settled_band(0, 0) is None
+
+
+def test_settled_band_waits_while_a_threshold_is_inside_the_interval():
+    assert stats.settled_band(8, 10, 0.9) is None
+    assert stats.settled_band(40, 50, 0.9) == 1
+
+
+def test_all_fail_settles_in_the_bottom_band():
+    assert stats.settled_band(0, 2, 0.9) == 0
+
+
+def test_all_pass_settles_in_the_top_band():
+    needed = stats.runs_to_settle(0.9)
+    assert stats.settled_band(needed, needed, 0.9) == TOP
+    assert stats.settled_band(needed - 1, needed - 1, 0.9) is None
+
+
+def test_default_cap_lets_a_flawless_prompt_settle():
+    config = SimulationConfig(npcs=["a"], prompts=["p"], model="m", adaptive=True)
+    assert stats.settled_band(config.max_runs, config.max_runs, config.confidence) == TOP
+
+
+def test_all_pass_arm_stops_before_max_runs():
+    # One flawless prompt among broken ones: the runs they give back let it settle
+    config = SimulationConfig(npcs=["a"], prompts=["p", "q", "r", "s"], model="m", adaptive=True, max_runs=30)
+    sampler = drain(config, {"p": "PASS", "q": "FAIL", "r": "FAIL", "s": "FAIL"})
+    flawless = sampler.arms[("a", 0)]
+    assert sampler.settled(flawless) == TOP
+    assert flawless.issued < config.max_runs
+    assert all(sampler.settled(arm) == 0 for key, arm in sampler.arms.items() if key != ("a", 0))